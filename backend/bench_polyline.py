@@ -0,0 +1,52 @@
+"""
+Benchmark: polyline_codec (vectorized) vs polyline_decoder (scalar reference).
+
+Usage: python bench_polyline.py [points] [routes]
+"""
+import sys
+import timeit
+
+import numpy as np
+
+import polyline_codec
+import polyline_decoder
+
+
+def synthetic_route(n_points, seed=0):
+    """Random-walk route around Hyderabad with ~20-50 m steps"""
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 0.0003, size=(n_points, 2))
+    return np.array([17.385, 78.4867]) + np.cumsum(steps, axis=0)
+
+
+def bench(label, fn, number):
+    best = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print(f"{label:<42} {best * 1000:9.3f} ms")
+    return best
+
+
+def main():
+    n_points = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_routes = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    encoded = [polyline_codec.encode(synthetic_route(n_points, seed)) for seed in range(n_routes)]
+    size_kb = sum(len(e) for e in encoded) / 1024
+    print(f"--- {n_routes} routes x {n_points} points ({size_kb:.1f} KB encoded) ---")
+
+    # Correctness first: both decoders must agree
+    for e in encoded:
+        ref = np.array(polyline_decoder.decode(e))
+        assert np.allclose(ref, polyline_codec.decode(e)), "decoders disagree"
+
+    old = bench("polyline_decoder.decode (per route)", lambda: [polyline_decoder.decode(e) for e in encoded], 3)
+    new = bench("polyline_codec.decode (per route)", lambda: [polyline_codec.decode(e) for e in encoded], 20)
+    batch = bench("polyline_codec.decode_many (batch)", lambda: polyline_codec.decode_many(encoded), 20)
+    routes = [polyline_codec.decode(e, 5) for e in encoded]
+    bench("polyline_codec.encode precision 5", lambda: [polyline_codec.encode(r, 5) for r in routes], 20)
+    bench("polyline_codec.encode precision 6", lambda: [polyline_codec.encode(r, 6) for r in routes], 20)
+
+    print(f"Speedup decode: {old / new:.1f}x per route, {old / batch:.1f}x batched")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: /safe-route response serialization, FastAPI response_model path vs the
+pre-validated fast path (RouteResponse.model_construct + FastJSONResponse).
+
+Reports time per KB of geometry JSON for the whole build + validate + encode pipeline.
+
+Usage: python bench_serialization.py [points] [routes]
+"""
+import json
+import sys
+import timeit
+from typing import List
+
+import numpy as np
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+import fast_json
+from fast_json import FastJSONResponse
+from risk_engine import RouteResponse
+from route_geometry import RouteGeometry
+
+
+def synthetic_route(n_points, seed=0):
+    """Random-walk route around Hyderabad with ~20-50 m steps"""
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 0.0003, size=(n_points, 2))
+    return RouteGeometry(np.array([17.385, 78.4867]) + np.cumsum(steps, axis=0))
+
+
+def route_fields(geometry, k):
+    return dict(route_id=f"r_direct_{k}", type="safe", summary="Safest", risk_score=35, risk_level="SAFE",
+                color="GREEN", details=["Near Charminar (High crime history reported)"],
+                geometry=geometry.to_latlng_list(), duration_min=24, duration_text="24 min",
+                distance_text="9.8 km", tags=["Safest"], exposure_m=0.0,
+                steps=[{"instruction": "Turn left onto Main Road", "distance": "120m"}] * 20)
+
+
+def bench(label, fn, number):
+    best = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print(f"{label:<42} {best * 1000:9.3f} ms")
+    return best
+
+
+def main():
+    n_points = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_routes = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    geometries = [synthetic_route(n_points, seed) for seed in range(n_routes)]
+    adapter = TypeAdapter(List[RouteResponse])
+
+    def standard():
+        # What FastAPI does for response_model=List[RouteResponse]: dump, re-validate, serialize, json.dumps
+        routes = [RouteResponse(**route_fields(g, k)) for k, g in enumerate(geometries)]
+        content = adapter.validate_python([r.model_dump() for r in routes])
+        return JSONResponse(adapter.dump_python(content, mode="json")).body
+
+    def fast():
+        routes = [RouteResponse.model_construct(**route_fields(g, k)) for k, g in enumerate(geometries)]
+        return FastJSONResponse(routes).body
+
+    assert json.loads(standard()) == json.loads(fast()), "serializers disagree"
+    geometry_kb = sum(len(fast_json.dumps(g.to_latlng_list())) for g in geometries) / 1024
+
+    print(f"{n_routes} routes x {n_points} points, {geometry_kb:.0f} KB geometry JSON, "
+          f"encoder: {'orjson' if fast_json.orjson is not None else 'json'}")
+    old = bench("response_model + JSONResponse", standard, 5)
+    new = bench("model_construct + FastJSONResponse", fast, 20)
+    print(f"Per KB of geometry: {old / geometry_kb * 1e6:.1f} us -> {new / geometry_kb * 1e6:.1f} us "
+          f"({old / new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Offline check of the local router on the bundled extract (data/city_extract.osm).
+
+Routes across the extract with and without zone risk, checks that the risk-aware
+route enters zones for no longer than the fastest one, that the grid-indexed edge
+cost pass matches a dense pass over every zone, and that an exhausted request
+deadline stops the router instead of overrunning it. No network or database.
+
+Usage: python check_local_router.py [extra random zones]
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from geo_kernels import segment_zone_exposure_km, segments_weighted_exposure_km
+from local_router import LOCAL_ROUTER_OSM, RISK_WEIGHTS, LocalRouter
+from request_deadline import deadline_scope
+from zone_set import ZoneSet
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+START, END = (17.345, 78.435), (17.445, 78.555)
+
+
+def load_zones(extra):
+    zones = []
+    for name in ("risk_zones.json", "accidental_zones.json"):
+        with open(os.path.join(DATA_DIR, name)) as f:
+            zones += json.load(f)
+    rng = np.random.default_rng(0)
+    for k in range(extra):
+        zones.append({"name": f"synthetic_{k}", "lat": float(rng.uniform(17.34, 17.45)),
+                      "lng": float(rng.uniform(78.43, 78.56)), "radius_meters": float(rng.uniform(100, 600)),
+                      "risk_level": "HIGH" if k % 3 == 0 else "MEDIUM"})
+    return ZoneSet(zones)
+
+
+def exposure_km(route, zone_set):
+    return float(segment_zone_exposure_km(route['geometry'].coords, zone_set.lat, zone_set.lng,
+                                          zone_set.cos_lat, zone_set.radius_km).sum())
+
+
+def dense_costs(graph, zone_set):
+    """Reference: every edge against every zone"""
+    weights = np.array([RISK_WEIGHTS[s] for s in zone_set.severity.tolist()])
+    starts = np.column_stack((graph.lat[graph.edge_src], graph.lng[graph.edge_src]))
+    ends = np.column_stack((graph.lat[graph.indices], graph.lng[graph.indices]))
+    weighted_m = segments_weighted_exposure_km(starts, ends, zone_set.lat, zone_set.lng, zone_set.cos_lat,
+                                               zone_set.radius_km, weights) * 1000.0
+    return graph.travel_s * (1.0 + weighted_m / np.maximum(graph.length_m, 1e-9))
+
+
+def main():
+    extra = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    zone_set = load_zones(extra)
+    router = LocalRouter(LOCAL_ROUTER_OSM, enabled=True)
+    graph = router.graph("driving")
+    assert graph is not None, f"could not load {LOCAL_ROUTER_OSM}"
+    print(f"--- {len(graph)} nodes / {len(graph.indices)} edges, {len(zone_set)} zones ---")
+
+    t = time.perf_counter()
+    costs = graph.edge_costs(zone_set, risk_aware=True)
+    print(f"Edge cost pass (grid indexed): {(time.perf_counter() - t) * 1000:.1f} ms")
+    assert np.allclose(costs, dense_costs(graph, zone_set), rtol=1e-9, atol=1e-9), "edge costs disagree with dense pass"
+
+    fast = router.route(START, END, "driving", zone_set, risk_aware=False)['routes'][0]
+    safe = router.route(START, END, "driving", zone_set, risk_aware=True)['routes'][0]
+    for label, route in (("fastest", fast), ("risk-aware", safe)):
+        print(f"{label:<11} {route['distance'] / 1000:6.2f} km {route['duration'] / 60:6.1f} min "
+              f"{exposure_km(route, zone_set) * 1000:7.0f} m inside zones")
+    assert exposure_km(safe, zone_set) <= exposure_km(fast, zone_set) + 1e-9, "risk-aware route is more exposed"
+    assert safe['duration'] >= fast['duration'] - 1e-9, "fastest route is not the fastest"
+    assert len(safe['node_ids']) == len(safe['geometry'].coords), "node ids do not match the geometry"
+
+    # A spent deadline stops the router (fresh router, so the cost pass is not cached)
+    late = LocalRouter(LOCAL_ROUTER_OSM, enabled=True)
+    with deadline_scope(0.0):
+        assert late.route(START, END, "driving", zone_set, risk_aware=True) is None, "deadline ignored"
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
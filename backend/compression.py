@@ -0,0 +1,224 @@
+"""
+HTTP response compression.
+
+CompressionMiddleware negotiates gzip or Brotli from Accept-Encoding and compresses
+bodies of at least COMPRESSION_MIN_BYTES; streamed bodies (e.g. /safe-route/stream)
+are compressed chunk by chunk with a flush after each, so events are not held back.
+Brotli needs the `brotli` package (in requirements.txt); without it only gzip is offered.
+
+PrecompressedPayloads keeps JSON bodies that only change with the data (zone lists)
+serialized and compressed per data version, so repeated requests skip both steps.
+Responses that already carry Content-Encoding pass through the middleware untouched.
+"""
+import os
+import threading
+import zlib
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+from fast_json import dumps as json_dumps
+
+try:
+    import brotli
+except ImportError:  # Listed in requirements.txt; without it only gzip is negotiated
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+# Precompressed payloads are built once per data version, so they can afford the slowest settings
+PRECOMPRESSED_GZIP_LEVEL = 9
+PRECOMPRESSED_BROTLI_QUALITY = 11
+
+_counters_lock = threading.Lock()
+_counters = {"compressed": 0, "skipped_small": 0, "streamed": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+def _count(**deltas):
+    with _counters_lock:
+        for key, value in deltas.items():
+            _counters[key] += value
+
+
+def compression_stats() -> Dict:
+    with _counters_lock:
+        stats = dict(_counters)
+    stats["brotli"] = brotli is not None
+    stats["min_bytes"] = COMPRESSION_MIN_BYTES
+    stats["ratio"] = round(stats["bytes_out"] / stats["bytes_in"], 4) if stats["bytes_in"] else 0.0
+    stats["precompressed"] = precompressed_payloads.stats()
+    return stats
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """'br' or 'gzip' from an Accept-Encoding header (q=0 refuses), or None for identity"""
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token:
+            accepted[token] = q
+    wildcard = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY if level is None else level)
+    compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL if level is None else level, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+class _StreamCompressor:
+    """Incremental compressor that flushes after every chunk"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._gz = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes, last: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._br.process(data)
+            return out + (self._br.finish() if last else self._br.flush())
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """ASGI middleware: gzip/Brotli for responses of at least minimum_size bytes"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        stream: Optional[_StreamCompressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, stream, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                passthrough = "content-encoding" in Headers(raw=message["headers"])
+                if passthrough:
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is None and start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                if not more_body:
+                    # Whole body in one message: compress only if it is worth it
+                    if len(body) < self.minimum_size:
+                        _count(skipped_small=1)
+                        await send(start)
+                        await send(message)
+                        start = None
+                        return
+                    compressed = compress(body, encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(compressed))
+                    headers.add_vary_header("Accept-Encoding")
+                    _count(compressed=1, bytes_in=len(body), bytes_out=len(compressed))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": compressed})
+                    start = None
+                    return
+                # Streamed body: size unknown up front, compress and flush chunk by chunk
+                stream = _StreamCompressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["content-length"]
+                _count(streamed=1)
+                await send(start)
+                start = None
+
+            if stream is None:
+                await send(message)
+                return
+            out = stream.chunk(body, last=not more_body)
+            _count(bytes_in=len(body), bytes_out=len(out))
+            await send({"type": "http.response.body", "body": out, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class PrecompressedPayloads:
+    """
+    JSON bodies cached per (key, data version), with each negotiated encoding compressed
+    once on first use. A new version for a key replaces the old entry.
+    """
+
+    def __init__(self, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.minimum_size = minimum_size
+        self._entries: Dict[str, Tuple[str, bytes, Dict[str, bytes]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def response(self, key: str, version: str, content, accept_encoding: Optional[str]) -> Response:
+        """JSON response for content (only serialized when version is new for key)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+            else:
+                self.misses += 1
+                entry = None
+        if entry is None:
+            entry = (version, json_dumps(content), {})
+            with self._lock:
+                self._entries[key] = entry
+        _, body, encoded = entry
+
+        encoding = negotiate_encoding(accept_encoding) if len(body) >= self.minimum_size else None
+        if encoding is None:
+            return Response(body, media_type="application/json", headers={"Vary": "Accept-Encoding"})
+        compressed = encoded.get(encoding)
+        if compressed is None:
+            level = PRECOMPRESSED_BROTLI_QUALITY if encoding == "br" else PRECOMPRESSED_GZIP_LEVEL
+            compressed = encoded.setdefault(encoding, compress(body, encoding, level))
+        return Response(compressed, media_type="application/json",
+                        headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": {key: {"version": version, "bytes": len(body),
+                                  "encoded": {enc: len(data) for enc, data in encoded.items()}}
+                            for key, (version, body, encoded) in self._entries.items()},
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Shared instance (per process)
+precompressed_payloads = PrecompressedPayloads()
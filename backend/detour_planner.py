@@ -0,0 +1,102 @@
+import os
+from typing import List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from geo_kernels import haversine_km
+from zone_set import ZoneSet
+
+# Hit zones whose edges are closer than this are bypassed with a single waypoint
+DETOUR_MERGE_GAP_KM = float(os.getenv("DETOUR_MERGE_GAP_KM", "0.5"))
+# At most this many zone clusters get their own detour fetch (worst first)
+DETOUR_MAX_CLUSTERS = int(os.getenv("DETOUR_MAX_CLUSTERS", "3"))
+
+LatLng = Tuple[float, float]
+
+
+class ZoneCluster(NamedTuple):
+    lat: float
+    lng: float
+    radius_km: float           # Circle around the cluster covering every member zone
+    zone_ids: Tuple[int, ...]  # ZoneSet indices
+    severity: int              # Highest member severity
+    route_pos: int             # Index of the route vertex closest to the cluster centre
+
+
+def get_detour_point(zone_lat, zone_lng, radius_km, start_lat, start_lng, end_lat, end_lng):
+    """
+    Calculates a waypoint to bypass a danger zone.
+    We determine the general direction of travel and offset the zone center perpendicular to it.
+    """
+    # Simple check: Are we moving mostly North/South or East/West?
+    lat_diff = abs(end_lat - start_lat)
+    lng_diff = abs(end_lng - start_lng)
+
+    offset_deg = (radius_km * 1.5) / 111.0 # Rough conversion to degrees
+
+    # If moving North/South, detour East or West
+    if lat_diff > lng_diff:
+        # Try West first
+        return (zone_lat, zone_lng - offset_deg)
+    else:
+        # Moving East/West, detour North or South
+        # Try North
+        return (zone_lat + offset_deg, zone_lng)
+
+
+def cluster_hit_zones(zone_set: ZoneSet, hit_zones: Sequence[int], route: np.ndarray,
+                      gap_km: float = DETOUR_MERGE_GAP_KM) -> List[ZoneCluster]:
+    """Groups hit zones whose circles overlap or lie within gap_km of each other"""
+    ids = np.asarray(sorted(set(hit_zones)), dtype=np.intp)
+    if len(ids) == 0:
+        return []
+
+    lat, lng, radius = zone_set.lat[ids], zone_set.lng[ids], zone_set.radius_km[ids]
+    # Pairwise edge gaps (a handful of zones per route, so the full matrix is tiny)
+    gaps = haversine_km(lat[:, None], lng[:, None], lat[None, :], lng[None, :]) - radius[:, None] - radius[None, :]
+    near = gaps <= gap_km
+
+    # Connected components (transitively adjacent zones form one cluster)
+    label = np.full(len(ids), -1)
+    for seed in range(len(ids)):
+        if label[seed] >= 0:
+            continue
+        label[seed] = seed
+        stack = [seed]
+        while stack:
+            k = stack.pop()
+            for j in np.flatnonzero(near[k] & (label < 0)):
+                label[j] = seed
+                stack.append(j)
+
+    clusters = []
+    for seed in np.unique(label):
+        members = np.flatnonzero(label == seed)
+        c_lat, c_lng = float(lat[members].mean()), float(lng[members].mean())
+        reach = haversine_km(c_lat, c_lng, lat[members], lng[members]) + radius[members]
+        pos = int(np.argmin(haversine_km(route[:, 0], route[:, 1], c_lat, c_lng))) if len(route) else 0
+        clusters.append(ZoneCluster(c_lat, c_lng, float(reach.max()), tuple(int(i) for i in ids[members]),
+                                    int(zone_set.severity[ids[members]].max()), pos))
+    return clusters
+
+
+def plan_detours(route: np.ndarray, zone_set: ZoneSet, hit_zones: Sequence[int],
+                 start: LatLng, end: LatLng, max_clusters: int = DETOUR_MAX_CLUSTERS) -> List[List[LatLng]]:
+    """
+    Waypoint lists for the detours worth fetching around the zones a route hits.
+    One detour per zone cluster (most severe / largest first), plus one through
+    all of those waypoints in travel order when the route hits several clusters.
+    A clean route yields no detours.
+    """
+    clusters = cluster_hit_zones(zone_set, hit_zones, route)
+    if not clusters:
+        return []
+
+    clusters.sort(key=lambda c: (-c.severity, -len(c.zone_ids), -c.radius_km))
+    chosen = sorted(clusters[:max_clusters], key=lambda c: c.route_pos)
+    waypoints = [get_detour_point(c.lat, c.lng, c.radius_km, start[0], start[1], end[0], end[1]) for c in chosen]
+
+    plans = [[wp] for wp in waypoints]
+    if len(waypoints) > 1:
+        plans.append(list(waypoints))
+    return plans
@@ -0,0 +1,44 @@
+"""
+JSON responses for trusted, already-shaped payloads.
+
+Endpoints that build their own response objects (RouteResponse via model_construct,
+zone lists straight from the data layer) return FastJSONResponse directly, so FastAPI
+skips response_model validation and jsonable_encoder. orjson is used when installed;
+the stdlib json module (same output as Starlette's JSONResponse) otherwise.
+"""
+import json
+from typing import Any
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # Listed in requirements.txt, but the stdlib fallback keeps it optional
+    orjson = None
+
+
+def _default(obj):
+    # Models built with model_construct hold exactly their field values
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return jsonable_encoder(obj)
+
+
+def dumps(content: Any) -> bytes:
+    """Serializes content (models, numpy values and plain JSON types) to UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -2,26 +2,42 @@ import firebase_admin
 from firebase_admin import credentials, firestore
 import os
 import json
-import googlemaps
-import requests
-from typing import List, Dict
+import hashlib
+import threading
+from typing import List, Dict, Tuple
+from request_deadline import stage_timeout
 
 # Path to service account key (user needs to place this file)
 CRED_PATH = os.path.join(os.path.dirname(__file__), "serviceAccountKey.json")
 LOCAL_DB_PATH = os.path.join(os.path.dirname(__file__), "data", "risk_zones.json")
 LOCAL_ACC_PATH = os.path.join(os.path.dirname(__file__), "data", "accidental_zones.json")
+# Firestore read cap; the request deadline may clip it further (falls back to local JSON)
+FIRESTORE_TIMEOUT_S = float(os.getenv("FIRESTORE_TIMEOUT_S", "8"))
+
+def _version_of(parts) -> str:
+    """Short id of a zone source state (doc ids + update times, or file stat); cheap to derive"""
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(str(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()[:16]
 
 class FirebaseService:
     def __init__(self):
         self.db = None
         self.use_local = True
         self.gmaps = None
+        # Zone lists as last loaded, keyed by source: name -> (version, zones). The version is
+        # derived from Firestore update times / file stat when loading, never from the zone content.
+        self._zone_cache: Dict[str, Tuple[str, List[Dict]]] = {}
+        self._zone_lock = threading.Lock()
         
         # Init Google Maps for Geocoding Fallback
         key = os.getenv("GOOGLE_MAPS_API_KEY")
         if key:
             try:
-                self.gmaps = googlemaps.Client(key=key)
+                from services.provider_clients import get_gmaps_client
+                self.gmaps = get_gmaps_client(key)
             except Exception as e:
                 print(f"Maps Client Init Error: {e}")
 
@@ -47,10 +63,21 @@ class FirebaseService:
 
     def get_risk_zones(self) -> List[Dict]:
         """Fetch risk zones from Firestore or Local JSON"""
+        return self.get_risk_zones_versioned()[1]
+
+    def get_risk_zones_versioned(self) -> Tuple[str, List[Dict]]:
+        """(data version, risk zones); unchanged Firestore/JSON data returns the cached list"""
         zones = []
         if not self.use_local and self.db:
             try:
-                docs = self.db.collection('risk_zones').stream()
+                timeout = stage_timeout(FIRESTORE_TIMEOUT_S)
+                if timeout is None:
+                    raise TimeoutError("request deadline reached")
+                docs = list(self.db.collection('risk_zones').stream(timeout=timeout))
+                version = _version_of(['risk_zones'] + [f"{doc.id}@{doc.update_time}" for doc in docs])
+                cached = self._cached_zones('risk_zones', version)
+                if cached is not None:
+                    return version, cached
                 for doc in docs:
                     data = doc.to_dict()
                     data = self._sanitize_data(data)
@@ -85,22 +112,31 @@ class FirebaseService:
                 print(f"DEBUG: Loaded {len(zones)} risk zones from Firebase")
                 if len(zones) == 0:
                     print("⚠️ Firestore empty, using LOCAL DATA fallback.")
-                    return self._load_local_zones()
-                return zones
+                    return self._load_local_zones_versioned()
+                return version, self._store_zones('risk_zones', version, zones)
             except Exception as e:
                 print(f"Firestore Read Error: {e}")
-                local = self._load_local_zones()
-                return local
+                return self._load_local_zones_versioned()
         else:
-            local = self._load_local_zones()
-            return local
+            return self._load_local_zones_versioned()
 
     def get_accidental_zones(self) -> List[Dict]:
         """Fetch accidental zones from Firestore"""
+        return self.get_accidental_zones_versioned()[1]
+
+    def get_accidental_zones_versioned(self) -> Tuple[str, List[Dict]]:
+        """(data version, accidental zones); unchanged Firestore/JSON data returns the cached list"""
         zones = []
         if not self.use_local and self.db:
             try:
-                docs = self.db.collection('accidental_zones').stream()
+                timeout = stage_timeout(FIRESTORE_TIMEOUT_S)
+                if timeout is None:
+                    raise TimeoutError("request deadline reached")
+                docs = list(self.db.collection('accidental_zones').stream(timeout=timeout))
+                version = _version_of(['accidental_zones'] + [f"{doc.id}@{doc.update_time}" for doc in docs])
+                cached = self._cached_zones('accidental_zones', version)
+                if cached is not None:
+                    return version, cached
                 for doc in docs:
                     data = doc.to_dict()
                     data = self._sanitize_data(data)
@@ -130,12 +166,29 @@ class FirebaseService:
                 print(f"DEBUG: Loaded {len(zones)} accidental zones from Firebase")
                 if len(zones) == 0:
                     print("⚠️ Firestore empty, using LOCAL ACCIDENTAL DATA fallback.")
-                    return self._load_local_zones(LOCAL_ACC_PATH)
-                return zones
+                    return self._load_local_zones_versioned(LOCAL_ACC_PATH)
+                return version, self._store_zones('accidental_zones', version, zones)
             except Exception as e:
                 print(f"Firestore Accidental Read Error: {e}")
-                return self._load_local_zones(LOCAL_ACC_PATH)
-        return self._load_local_zones(LOCAL_ACC_PATH)
+                return self._load_local_zones_versioned(LOCAL_ACC_PATH)
+        return self._load_local_zones_versioned(LOCAL_ACC_PATH)
+
+    def get_zone_set(self):
+        """Risk + accidental zones compiled into a ZoneSet (recompiled only when the data changes)"""
+        from zone_set import compile_zone_set
+        risk_version, risk = self.get_risk_zones_versioned()
+        acc_version, acc = self.get_accidental_zones_versioned()
+        return compile_zone_set(risk + acc, version=_version_of([risk_version, acc_version]))
+
+    def _cached_zones(self, source: str, version: str):
+        with self._zone_lock:
+            entry = self._zone_cache.get(source)
+        return entry[1] if entry is not None and entry[0] == version else None
+
+    def _store_zones(self, source: str, version: str, zones: List[Dict]) -> List[Dict]:
+        with self._zone_lock:
+            self._zone_cache[source] = (version, zones)
+        return zones
 
     def add_safety_report(self, report_data: Dict):
         """Save report to Firestore and potentially update a risk zone"""
@@ -201,11 +254,17 @@ class FirebaseService:
                 new_data[k] = v
         return new_data
 
-    def _load_local_zones(self, path=LOCAL_DB_PATH):
-        if os.path.exists(path):
-            with open(path, 'r') as f:
-                return json.load(f)
-        return []
+    def _load_local_zones_versioned(self, path=LOCAL_DB_PATH) -> Tuple[str, List[Dict]]:
+        """Local JSON zones, re-read only when the file's mtime/size change"""
+        if not os.path.exists(path):
+            return _version_of([path, "missing"]), []
+        st = os.stat(path)
+        version = _version_of([path, st.st_mtime_ns, st.st_size])
+        cached = self._cached_zones(path, version)
+        if cached is not None:
+            return version, cached
+        with open(path, 'r') as f:
+            return version, self._store_zones(path, version, json.load(f))
 
 # Singleton instance
 firebase_svc = FirebaseService()
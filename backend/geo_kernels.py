@@ -0,0 +1,190 @@
+import numpy as np
+
+# Same Earth radius as risk_engine.haversine so both paths agree on distances
+EARTH_RADIUS_KM = 6371.0
+
+# Max number of (vertex, zone) pairs evaluated per batch (~8 MB of float64 per temp array)
+MAX_BATCH_PAIRS = 1_000_000
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Vectorized haversine (degrees in, KM out). Inputs broadcast like any numpy ufunc."""
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    return haversine_km_rad(lat1, np.radians(lng1), np.cos(lat1), lat2, np.radians(lng2), np.cos(lat2))
+
+
+def haversine_km_rad(lat1, lng1, cos1, lat2, lng2, cos2):
+    """Haversine on inputs already in radians, with cos(lat) precomputed for both sides."""
+    a = np.sin((lat2 - lat1) / 2) ** 2 + cos1 * cos2 * np.sin((lng2 - lng1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def as_route_array(coords) -> np.ndarray:
+    """Coerce [[lat, lng], ...] into a contiguous (N, 2) float64 array."""
+    return np.ascontiguousarray(coords, dtype=np.float64).reshape(-1, 2)
+
+
+def route_zone_hits(route: np.ndarray, zone_lat_rad: np.ndarray, zone_lng_rad: np.ndarray,
+                    zone_cos_lat: np.ndarray, radius_km: np.ndarray):
+    """
+    Tests every route vertex against every zone in one batched pass.
+
+    Args:
+        route: (N, 2) array of [lat, lng] in degrees
+        zone_lat_rad, zone_lng_rad, zone_cos_lat, radius_km: (Z,) arrays
+
+    Returns:
+        (hit, hit_dist): hit is a (Z,) bool array (any vertex strictly inside the zone),
+        hit_dist holds the distance of the first vertex inside each hit zone (KM, NaN if no hit).
+    """
+    n_zones = len(zone_lat_rad)
+    hit = np.zeros(n_zones, dtype=bool)
+    hit_dist = np.full(n_zones, np.nan)
+    if n_zones == 0 or len(route) == 0:
+        return hit, hit_dist
+
+    route_rad = np.radians(route)
+    route_cos = np.cos(route_rad[:, 0:1])
+
+    # Chunk along the route so long geometries x many zones stay within a bounded footprint
+    chunk = max(1, MAX_BATCH_PAIRS // n_zones)
+    for start in range(0, len(route), chunk):
+        pending = np.flatnonzero(~hit)
+        if len(pending) == 0:
+            break
+        part = route_rad[start:start + chunk]
+        dist = haversine_km_rad(part[:, 0:1], part[:, 1:2], route_cos[start:start + chunk],
+                                zone_lat_rad[pending], zone_lng_rad[pending], zone_cos_lat[pending])  # (n, z)
+        inside = dist < radius_km[pending]
+
+        found = inside.any(axis=0)
+        if found.any():
+            first = inside.argmax(axis=0)  # First vertex inside each zone (route order)
+            cols = np.flatnonzero(found)
+            zone_ids = pending[cols]
+            hit[zone_ids] = True
+            hit_dist[zone_ids] = dist[first[cols], cols]
+
+    return hit, hit_dist
+
+
+def polyline_zone_distance_km(route: np.ndarray, zone_lat: np.ndarray, zone_lng: np.ndarray,
+                              zone_cos_lat: np.ndarray) -> np.ndarray:
+    """
+    Minimum distance (KM) from each zone centre to the polyline, segments included.
+
+    Uses an equirectangular projection around each zone centre, which is accurate to
+    well under 1% at city scale. Meant as a coarse filter, not for final hit decisions.
+
+    Args:
+        route: (N, 2) array of [lat, lng] in degrees
+        zone_lat, zone_lng, zone_cos_lat: (Z,) arrays (degrees / cos of latitude)
+    """
+    n_zones = len(zone_lat)
+    best = np.full(n_zones, np.inf)
+    if n_zones == 0 or len(route) == 0:
+        return best
+
+    km_per_deg = np.radians(EARTH_RADIUS_KM)
+    if len(route) == 1:
+        starts, ends = route, route
+    else:
+        starts, ends = route[:-1], route[1:]
+
+    chunk = max(1, MAX_BATCH_PAIRS // n_zones)
+    for s in range(0, len(starts), chunk):
+        a = starts[s:s + chunk]
+        b = ends[s:s + chunk]
+        # Segment endpoints relative to each zone centre, in KM: (n, z)
+        ax = (a[:, 1:2] - zone_lng) * zone_cos_lat * km_per_deg
+        ay = (a[:, 0:1] - zone_lat) * km_per_deg
+        dx = (b[:, 1:2] - a[:, 1:2]) * zone_cos_lat * km_per_deg
+        dy = np.broadcast_to((b[:, 0:1] - a[:, 0:1]) * km_per_deg, ax.shape)
+
+        seg_len2 = dx * dx + dy * dy
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = np.where(seg_len2 > 0, -(ax * dx + ay * dy) / seg_len2, 0.0)
+        t = np.clip(t, 0.0, 1.0)
+        dist = np.hypot(ax + t * dx, ay + t * dy)
+        best = np.minimum(best, dist.min(axis=0))
+
+    return best
+
+
+def segment_zone_exposure_km(route: np.ndarray, zone_lat: np.ndarray, zone_lng: np.ndarray,
+                             zone_cos_lat: np.ndarray, radius_km: np.ndarray) -> np.ndarray:
+    """
+    Length of route (KM) that runs inside each zone circle, via segment-to-circle intersection.
+
+    A zone is caught even when no vertex falls inside it (sparse geometries crossing a
+    small zone), and dense geometries cost one batched pass over their segments.
+
+    Args:
+        route: (N, 2) array of [lat, lng] in degrees, N >= 2
+        zone_lat, zone_lng, zone_cos_lat, radius_km: (Z,) arrays
+
+    Returns:
+        (Z,) array of exposure lengths in KM (0 where the route never enters the zone)
+    """
+    n_zones = len(zone_lat)
+    exposure = np.zeros(n_zones)
+    if n_zones == 0 or len(route) < 2:
+        return exposure
+
+    starts, ends = route[:-1], route[1:]
+    chunk = max(1, MAX_BATCH_PAIRS // n_zones)
+    for s in range(0, len(starts), chunk):
+        exposure += segments_inside_km(starts[s:s + chunk], ends[s:s + chunk],
+                                       zone_lat, zone_lng, zone_cos_lat, radius_km).sum(axis=0)
+    return exposure
+
+
+def segments_weighted_exposure_km(starts: np.ndarray, ends: np.ndarray, zone_lat: np.ndarray, zone_lng: np.ndarray,
+                                  zone_cos_lat: np.ndarray, radius_km: np.ndarray,
+                                  weights: np.ndarray) -> np.ndarray:
+    """
+    Per-segment counterpart of segment_zone_exposure_km for independent segments (e.g. graph edges).
+
+    Args:
+        starts, ends: (M, 2) arrays of segment endpoints [lat, lng] in degrees
+        zone_*: (Z,) arrays; weights: (Z,) per-zone weight (e.g. severity)
+
+    Returns:
+        (M,) array: sum over zones of (KM of the segment inside the zone) * weight
+    """
+    out = np.zeros(len(starts))
+    if len(zone_lat) == 0 or len(starts) == 0:
+        return out
+
+    chunk = max(1, MAX_BATCH_PAIRS // len(zone_lat))
+    for s in range(0, len(starts), chunk):
+        out[s:s + chunk] = segments_inside_km(starts[s:s + chunk], ends[s:s + chunk],
+                                              zone_lat, zone_lng, zone_cos_lat, radius_km) @ weights
+    return out
+
+
+def segments_inside_km(a, b, zone_lat, zone_lng, zone_cos_lat, radius_km) -> np.ndarray:
+    """
+    (n, z) KM of each segment a[i]->b[i] inside each zone circle (local planar projection).
+    Unbatched: callers keep n * z under MAX_BATCH_PAIRS.
+    """
+    km_per_deg = np.radians(EARTH_RADIUS_KM)
+    # Segment start relative to each zone centre and segment direction, in KM: (n, z)
+    ax = (a[:, 1:2] - zone_lng) * zone_cos_lat * km_per_deg
+    ay = (a[:, 0:1] - zone_lat) * km_per_deg
+    dx = (b[:, 1:2] - a[:, 1:2]) * zone_cos_lat * km_per_deg
+    dy = (b[:, 0:1] - a[:, 0:1]) * km_per_deg
+
+    # |A + tD|^2 = r^2  ->  qa t^2 + qb t + qc = 0
+    qa = dx * dx + dy * dy
+    qb = 2 * (ax * dx + ay * dy)
+    qc = ax * ax + ay * ay - radius_km * radius_km
+    disc = qb * qb - 4 * qa * qc
+
+    crossing = (disc > 0) & (qa > 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        root = np.sqrt(np.where(crossing, disc, 0.0))
+        t_in = np.clip((-qb - root) / (2 * qa), 0.0, 1.0)
+        t_out = np.clip((-qb + root) / (2 * qa), 0.0, 1.0)
+        return np.where(crossing, (t_out - t_in) * np.sqrt(qa), 0.0)
@@ -0,0 +1,328 @@
+"""
+Optional in-process router over an OSM extract.
+
+The road network is loaded once into CSR arrays (indptr / indices plus per-edge
+length, travel time and street name) per travel profile. Routes come from A*
+whose edge costs add a zone-risk penalty to travel time, so a risk-avoiding
+route is one local search with no provider round-trip. Results use the same
+OSRM-like shape as the provider adapters (RouteGeometry + distance/duration/legs).
+
+Disabled unless LOCAL_ROUTER_ENABLED=1; data/city_extract.osm is a small
+synthetic street grid for offline testing (python check_local_router.py), point
+LOCAL_ROUTER_OSM at a real extract (e.g. cut with osmium) for production use.
+"""
+import heapq
+import os
+import threading
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from geo_kernels import haversine_km, segments_weighted_exposure_km
+from request_deadline import MIN_STAGE_S, remaining_budget
+from route_geometry import RouteGeometry
+from zone_set import Severity, ZoneSet
+
+LOCAL_ROUTER_ENABLED = os.getenv("LOCAL_ROUTER_ENABLED", "0") == "1"
+LOCAL_ROUTER_OSM = os.getenv("LOCAL_ROUTER_OSM", os.path.join(os.path.dirname(__file__), "data", "city_extract.osm"))
+# Origin/destination further than this from the nearest graph node are outside the extract
+LOCAL_ROUTER_MAX_SNAP_M = float(os.getenv("LOCAL_ROUTER_MAX_SNAP_M", "300"))
+# Extra cost of a metre driven inside a zone, as a multiple of that metre's travel time
+RISK_WEIGHTS = {
+    Severity.HIGH: float(os.getenv("LOCAL_ROUTER_HIGH_WEIGHT", "8")),
+    Severity.MEDIUM: float(os.getenv("LOCAL_ROUTER_MEDIUM_WEIGHT", "3")),
+}
+
+# Speeds in km/h per highway type; highway types missing from a profile are not routable
+PROFILES = {
+    "driving": {
+        "oneway": True,
+        "speeds": {"motorway": 80, "trunk": 60, "primary": 50, "secondary": 40, "tertiary": 35,
+                   "unclassified": 30, "residential": 25, "living_street": 10, "service": 15,
+                   "motorway_link": 50, "trunk_link": 40, "primary_link": 35, "secondary_link": 30,
+                   "tertiary_link": 25},
+    },
+    "cycling": {
+        "oneway": True,
+        "speeds": {"primary": 15, "secondary": 15, "tertiary": 15, "unclassified": 15, "residential": 15,
+                   "living_street": 12, "service": 12, "cycleway": 18, "track": 10,
+                   "primary_link": 15, "secondary_link": 15, "tertiary_link": 15},
+    },
+    "walking": {
+        "oneway": False,
+        "speeds": {"primary": 5, "secondary": 5, "tertiary": 5, "unclassified": 5, "residential": 5,
+                   "living_street": 5, "service": 5, "footway": 5, "pedestrian": 5, "path": 4.5,
+                   "steps": 2, "track": 4.5, "cycleway": 5,
+                   "primary_link": 5, "secondary_link": 5, "tertiary_link": 5},
+    },
+}
+# A* checks the request deadline every this many settled nodes
+DEADLINE_CHECK_EVERY = 4096
+
+MODE_PROFILE = {"driving": "driving", "car": "driving", "transit": "driving", "bus": "driving",
+                "cycling": "cycling", "bike": "cycling", "walking": "walking", "walk": "walking"}
+
+
+def _parse_osm(path: str):
+    """Nodes {id: (lat, lng)} and ways [(node refs, tags)] with a highway tag"""
+    nodes: Dict[int, Tuple[float, float]] = {}
+    ways: List[Tuple[List[int], Dict[str, str]]] = []
+    for _, elem in ET.iterparse(path, events=("end",)):
+        if elem.tag == "node":
+            nodes[int(elem.get("id"))] = (float(elem.get("lat")), float(elem.get("lon")))
+            elem.clear()
+        elif elem.tag == "way":
+            tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+            if "highway" in tags:
+                ways.append(([int(nd.get("ref")) for nd in elem.iter("nd")], tags))
+            elem.clear()
+    return nodes, ways
+
+
+def _out_of_time() -> bool:
+    remaining = remaining_budget()
+    return remaining is not None and remaining < MIN_STAGE_S
+
+
+def _maxspeed_kmh(tags: Dict[str, str]) -> Optional[float]:
+    value = tags.get("maxspeed", "").split(" ")[0]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RoadGraph:
+    """CSR road graph for one travel profile"""
+
+    def __init__(self, nodes, ways, profile: str):
+        spec = PROFILES[profile]
+        self.profile = profile
+        self.names: List[str] = [""]
+        name_ids: Dict[str, int] = {"": 0}
+        src, dst, speed, name = [], [], [], []
+
+        for refs, tags in ways:
+            kmh = spec["speeds"].get(tags.get("highway"))
+            if kmh is None:
+                continue
+            if profile == "driving":
+                kmh = _maxspeed_kmh(tags) or kmh
+            oneway = tags.get("oneway", "no") if spec["oneway"] else "no"
+            forward = oneway != "-1"
+            backward = oneway not in ("yes", "1", "true")
+            label = tags.get("name", "")
+            nid = name_ids.setdefault(label, len(name_ids))
+            if nid == len(self.names):
+                self.names.append(label)
+            refs = [r for r in refs if r in nodes]
+            for u, v in zip(refs[:-1], refs[1:]):
+                if forward:
+                    src.append(u); dst.append(v); speed.append(kmh); name.append(nid)
+                if backward:
+                    src.append(v); dst.append(u); speed.append(kmh); name.append(nid)
+
+        # Compact node numbering over the nodes that are actually routable
+        osm_ids = np.unique(np.array(src + dst, dtype=np.int64))
+        self.node_ids = osm_ids
+        coords = np.array([nodes[i] for i in osm_ids.tolist()], dtype=np.float64).reshape(-1, 2)
+        self.lat = coords[:, 0].copy()
+        self.lng = coords[:, 1].copy()
+
+        s = np.searchsorted(osm_ids, np.array(src, dtype=np.int64))
+        d = np.searchsorted(osm_ids, np.array(dst, dtype=np.int64))
+        order = np.argsort(s, kind="stable")
+        s, d = s[order], d[order]
+        self.indices = d
+        self.edge_src = s
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(s, minlength=len(osm_ids)))))
+        self.length_m = haversine_km(self.lat[s], self.lng[s], self.lat[d], self.lng[d]) * 1000.0
+        speed_mps = np.array(speed, dtype=np.float64)[order] / 3.6
+        self.travel_s = self.length_m / speed_mps
+        self.edge_name = np.array(name, dtype=np.int32)[order]
+        self.max_speed_mps = float(speed_mps.max()) if len(speed_mps) else 1.0
+
+        # Plain lists for the search loop (numpy scalar access is slow per element)
+        self._indptr_list = self.indptr.tolist()
+        self._indices_list = self.indices.tolist()
+        self._edge_src_list = s.tolist()
+        self._cost_lock = threading.Lock()
+        self._cost_cache: Dict[Tuple[str, bool], List[float]] = {}
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def nearest_node(self, lat: float, lng: float) -> Tuple[int, float]:
+        """(node index, distance in metres)"""
+        dist = haversine_km(self.lat, self.lng, lat, lng)
+        k = int(np.argmin(dist))
+        return k, float(dist[k]) * 1000.0
+
+    def edge_costs(self, zone_set: Optional[ZoneSet], risk_aware: bool) -> Optional[List[float]]:
+        """
+        Travel time plus the weighted time spent inside zones; cached per zone data version.
+        Edges are tested only against the zones the grid index puts near them. Returns None
+        (and caches nothing) when the request deadline runs out before the pass completes.
+        """
+        key = (zone_set.version if zone_set is not None and risk_aware else "", risk_aware)
+        with self._cost_lock:
+            cached = self._cost_cache.get(key)
+        if cached is not None:
+            return cached
+
+        cost = self.travel_s
+        if risk_aware and zone_set is not None and len(zone_set):
+            by_severity = np.zeros(max(Severity) + 1)
+            for severity, weight in RISK_WEIGHTS.items():
+                by_severity[severity] = weight
+            weights = by_severity[zone_set.severity]
+            starts = np.column_stack((self.lat[self.edge_src], self.lng[self.edge_src]))
+            ends = np.column_stack((self.lat[self.indices], self.lng[self.indices]))
+            weighted_m = np.zeros(len(self.travel_s))
+            # One pass per grid cell of edges, against only the zones near that cell
+            for rows, ids in zone_set.index.segment_groups(starts, ends):
+                if _out_of_time():
+                    print("DEBUG: Local router edge costs abandoned: request deadline reached")
+                    return None
+                weighted_m[rows] = segments_weighted_exposure_km(starts[rows], ends[rows], zone_set.lat[ids],
+                                                                 zone_set.lng[ids], zone_set.cos_lat[ids],
+                                                                 zone_set.radius_km[ids], weights[ids]) * 1000.0
+            frac = np.divide(weighted_m, self.length_m, out=np.zeros_like(weighted_m), where=self.length_m > 0)
+            cost = self.travel_s * (1.0 + frac)
+
+        costs = cost.tolist()
+        with self._cost_lock:
+            # Keep the latest zone version only (plus the risk-free costs)
+            self._cost_cache = {k: v for k, v in self._cost_cache.items() if not k[1]}
+            self._cost_cache[key] = costs
+        return costs
+
+    def shortest_path(self, source: int, target: int, costs: List[float]) -> Optional[List[int]]:
+        """
+        A* over edge costs; returns the edge indices of the path, or None if unreachable
+        or the request deadline runs out first
+        """
+        # Straight-line time at top speed never overestimates (costs >= travel time)
+        h = (haversine_km(self.lat, self.lng, self.lat[target], self.lng[target]) * 1000.0
+             / self.max_speed_mps).tolist()
+        indptr, indices = self._indptr_list, self._indices_list
+        best = {source: 0.0}
+        via_edge: Dict[int, int] = {}
+        heap = [(h[source], source)]
+        closed = set()
+        while heap:
+            _, u = heapq.heappop(heap)
+            if u in closed:
+                continue
+            if u == target:
+                break
+            closed.add(u)
+            if len(closed) % DEADLINE_CHECK_EVERY == 0 and _out_of_time():
+                print("DEBUG: Local router search abandoned: request deadline reached")
+                return None
+            g_u = best[u]
+            for e in range(indptr[u], indptr[u + 1]):
+                v = indices[e]
+                g = g_u + costs[e]
+                if g < best.get(v, float("inf")):
+                    best[v] = g
+                    via_edge[v] = e
+                    heapq.heappush(heap, (g + h[v], v))
+        if target != source and target not in via_edge:
+            return None
+
+        path = []
+        node = target
+        while node != source:
+            e = via_edge[node]
+            path.append(e)
+            node = self._edge_src_list[e]
+        path.reverse()
+        return path
+
+    def to_route(self, source: int, edges: List[int]) -> Dict:
+        """OSRM-like route dict (see services.ors_service._adapt_ors_to_osrm)"""
+        nodes = [source] + [int(self.indices[e]) for e in edges]
+        geometry = RouteGeometry(np.column_stack((self.lat[nodes], self.lng[nodes])))
+        edges = np.asarray(edges, dtype=np.intp)
+
+        steps = []
+        for k, e in enumerate(edges.tolist()):
+            label = self.names[self.edge_name[e]]
+            if steps and steps[-1]['name'] == label:
+                steps[-1]['distance'] += float(self.length_m[e])
+                continue
+            steps.append({'maneuver': {'type': 'depart' if k == 0 else 'turn'}, 'name': label,
+                          'distance': float(self.length_m[e])})
+        steps.append({'maneuver': {'type': 'arrive'}, 'name': '', 'distance': 0})
+
+        return {
+            'geometry': geometry,
+            'distance': float(self.length_m[edges].sum()) if len(edges) else 0.0,
+            'duration': float(self.travel_s[edges].sum()) if len(edges) else 0.0,
+            'weight_name': 'safety',
+            'legs': [{'steps': steps}],
+            'node_ids': self.node_ids[nodes],
+        }
+
+
+class LocalRouter:
+    """Lazily loaded graphs (one per profile) over a single OSM extract"""
+
+    def __init__(self, path: str = LOCAL_ROUTER_OSM, enabled: bool = LOCAL_ROUTER_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._parsed = None
+        self._graphs: Dict[str, RoadGraph] = {}
+        self._failed = False
+
+    def graph(self, mode: str) -> Optional[RoadGraph]:
+        if not self.enabled or self._failed:
+            return None
+        profile = MODE_PROFILE.get(mode, "driving")
+        graph = self._graphs.get(profile)
+        if graph is not None:
+            return graph
+        with self._lock:
+            graph = self._graphs.get(profile)
+            if graph is None:
+                try:
+                    if self._parsed is None:
+                        self._parsed = _parse_osm(self.path)
+                    graph = RoadGraph(*self._parsed, profile)
+                    print(f"DEBUG: Local router loaded {len(graph)} nodes / {len(graph.indices)} edges ({profile})")
+                except Exception as e:
+                    print(f"⚠️ Local router disabled, could not load {self.path}: {e}")
+                    self._failed = True
+                    return None
+                self._graphs[profile] = graph
+        return graph
+
+    def loaded_graphs(self) -> List[RoadGraph]:
+        """Graphs already in memory (never triggers a load)"""
+        return list(self._graphs.values())
+
+    def route(self, start, end, mode: str, zone_set: Optional[ZoneSet] = None, risk_aware: bool = True):
+        """
+        Route between (lat, lng) points as {'routes': [route]} (provider shape), or None when the
+        router is disabled or either point lies outside the extract.
+        """
+        graph = self.graph(mode)
+        if graph is None:
+            return None
+        source, d_src = graph.nearest_node(start[0], start[1])
+        target, d_dst = graph.nearest_node(end[0], end[1])
+        if max(d_src, d_dst) > LOCAL_ROUTER_MAX_SNAP_M:
+            return None
+        costs = graph.edge_costs(zone_set, risk_aware)
+        if costs is None:
+            return None
+        edges = graph.shortest_path(source, target, costs)
+        if edges is None:
+            return None
+        return {'routes': [graph.to_route(source, edges)]}
+
+
+local_router = LocalRouter()
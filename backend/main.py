@@ -1,9 +1,13 @@
-from fastapi import FastAPI, HTTPException, Body
+from fastapi import FastAPI, HTTPException, Body, Header, Request
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from typing import List, Optional
 import uvicorn
+import asyncio
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -14,6 +18,23 @@ from firebase_service import firebase_svc
 from fastapi.middleware.cors import CORSMiddleware
 # Import the new search function
 from services.geocoding_service import search_places
+from zone_hit_cache import zone_cell_memo
+from route_cache import route_cache
+from segment_risk import segment_risk_table
+from services.provider_clients import connection_stats
+from services.provider_hedging import direct_route_hedge
+from services.provider_health import provider_health
+from request_deadline import deadline_scope
+from route_geometry import GEOMETRY_FORMATS
+from fast_json import FastJSONResponse, dumps as json_dumps
+from compression import CompressionMiddleware, compression_stats, precompressed_payloads
+
+# Total time /safe-route may spend on geocoding + routing (mobile client gives up at 60 s)
+SAFE_ROUTE_BUDGET_S = float(os.getenv("SAFE_ROUTE_BUDGET_S", "25"))
+# Concurrent /safe-route/stream pipelines; further streams queue for a worker
+SAFE_ROUTE_STREAM_WORKERS = int(os.getenv("SAFE_ROUTE_STREAM_WORKERS", "16"))
+
+_STREAM_POOL = ThreadPoolExecutor(max_workers=SAFE_ROUTE_STREAM_WORKERS, thread_name_prefix="safe-route-stream")
 
 app = FastAPI(title="SafeRoute API", description="Safety-aware navigation backend", version="1.0.0")
 
@@ -25,6 +46,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# gzip/Brotli for bodies above COMPRESSION_MIN_BYTES (zone lists arrive precompressed, see below)
+app.add_middleware(CompressionMiddleware)
 
 class SafetyReport(BaseModel):
     location: dict
@@ -40,6 +63,16 @@ def read_root():
 def health_check():
     return {"status": "ok", "message": "SafeRoute Backend is Running"}
 
+@app.get("/api/diagnostics")
+def diagnostics():
+    """
+    Runtime cache/engine counters for this worker process.
+    """
+    return {"zone_memo": zone_cell_memo.stats(), "http": connection_stats(),
+            "direct_route_hedge": direct_route_hedge.stats(), "providers": provider_health.stats(),
+            "route_cache": route_cache.stats(), "segment_risk": segment_risk_table.stats(),
+            "compression": compression_stats()}
+
 @app.get("/api/search")
 def search_locations(query: str):
     """
@@ -52,32 +85,118 @@ def search_locations(query: str):
     print(f"DEBUG: Search returned {len(results)} results")
     return results
 
+def _geometry_format(query_value: Optional[str], header_value: Optional[str]) -> str:
+    """Route geometry wire format: ?geometry_format= wins over the X-Geometry-Format header, default "json" """
+    fmt = (query_value or header_value or "json").strip().lower()
+    if fmt not in GEOMETRY_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported geometry_format '{fmt}', expected one of {list(GEOMETRY_FORMATS)}")
+    return fmt
+
 @app.post("/safe-route", response_model=List[RouteResponse])
-def get_safe_routes(request: RouteRequest):
+def get_safe_routes(request: RouteRequest, geometry_format: Optional[str] = None,
+                    x_geometry_format: Optional[str] = Header(None)):
     """
     Calculate and return safe routes based on origin, destination, time, and preferences.
+    Geometry is [[lat, lng], ...] by default; polyline5/6 or delta5/6 on request (see GEOMETRY_FORMATS).
+    Routes are built pre-validated by the engine, so they are serialized directly (response_model
+    documents the shape but is not re-checked).
     """
+    fmt = _geometry_format(geometry_format, x_geometry_format)
     try:
         print(f"DEBUG: Route Request: {request}")
-        routes = calculate_route_risk(request)
-        return routes
+        # Every provider call below is clipped to what is left of this budget
+        with deadline_scope(SAFE_ROUTE_BUDGET_S):
+            routes = calculate_route_risk(request, geometry_format=fmt)
+        return FastJSONResponse(routes)
     except Exception as e:
         print(f"CRITICAL ERROR in calculate_route_risk: {e}")
         return []
 
+def _ndjson(event: str, payload: dict) -> bytes:
+    return json_dumps({"event": event, **payload}) + b"\n"
+
+class _StreamClosed(Exception):
+    """Raised into the route pipeline once the streaming client has gone away"""
+
+@app.post("/safe-route/stream")
+async def stream_safe_routes(request: RouteRequest, geometry_format: Optional[str] = None,
+                       x_geometry_format: Optional[str] = Header(None)):
+    """
+    Same pipeline as /safe-route, streamed as NDJSON (application/x-ndjson), one event per line:
+    {"event": "route", "candidate": k, "route": {...}} as soon as each route is scored (direct first),
+    then {"event": "ranking", "routes": [{"candidate", "route_id", "type", "summary", "tags"}, ...]}
+    with the final order and tags (empty on failure). The ranking event is always the last line.
+    Geometry format negotiation as in /safe-route. The pipeline runs on a bounded worker pool
+    and stops at its next event once the client disconnects.
+    """
+    fmt = _geometry_format(geometry_format, x_geometry_format)
+    print(f"DEBUG: Streaming Route Request: {request}")
+    loop = asyncio.get_running_loop()
+    events: "asyncio.Queue" = asyncio.Queue()
+    closed = threading.Event()
+
+    def push(item):
+        if closed.is_set():
+            raise _StreamClosed()
+        try:
+            loop.call_soon_threadsafe(events.put_nowait, item)
+        except RuntimeError:  # Event loop already gone
+            closed.set()
+            raise _StreamClosed()
+
+    def run():
+        try:
+            if closed.is_set():
+                raise _StreamClosed()  # Client left while this stream was queued
+            with deadline_scope(SAFE_ROUTE_BUDGET_S):
+                calculate_route_risk(request, on_event=lambda event, payload: push((event, payload)),
+                                     geometry_format=fmt)
+        except _StreamClosed:
+            print("DEBUG: Route stream client disconnected, pipeline stopped")
+            return
+        except Exception as e:
+            print(f"CRITICAL ERROR in calculate_route_risk (stream): {e}")
+        try:
+            push(None)
+        except _StreamClosed:
+            pass
+
+    _STREAM_POOL.submit(run)
+
+    async def lines():
+        ranked = False
+        try:
+            while True:
+                item = await events.get()
+                if item is None:
+                    break
+                ranked = ranked or item[0] == "ranking"
+                yield _ndjson(*item)
+            if not ranked:
+                yield _ndjson("ranking", {"routes": []})
+        finally:
+            closed.set()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.get("/risk-zones")
-def get_risk_zones():
+def get_risk_zones(request: Request):
     """
     Get all active risk zones from the database for map visualization.
+    Serialized and compressed once per zone data version (derived by the data layer on load).
     """
-    return firebase_svc.get_risk_zones()
+    version, zones = firebase_svc.get_risk_zones_versioned()
+    return precompressed_payloads.response("risk-zones", version, zones, request.headers.get("accept-encoding"))
 
 @app.get("/accidental-zones")
-def get_accidental_zones():
+def get_accidental_zones(request: Request):
     """
     Get all accidental zones (Yellow) for map visualization.
+    Serialized and compressed once per zone data version (derived by the data layer on load).
     """
-    return firebase_svc.get_accidental_zones()
+    version, zones = firebase_svc.get_accidental_zones_versioned()
+    return precompressed_payloads.response("accidental-zones", version, zones,
+                                           request.headers.get("accept-encoding"))
 
 @app.post("/report-unsafe")
 def report_unsafe_area(report: SafetyReport):
@@ -0,0 +1,119 @@
+"""
+Vectorized Google encoded-polyline codec (precision 5 or 6).
+
+Decodes straight into (N, 2) float64 [lat, lng] arrays, encodes from any (N, 2)
+array-like, and batch-decodes many polylines in a single numpy pass.
+polyline_decoder.decode is kept as the reference scalar implementation.
+"""
+from typing import List, Sequence
+
+import numpy as np
+
+SUPPORTED_PRECISIONS = (5, 6)
+
+# Longest possible chunk run for a zig-zagged int64 (64 bits / 5 bits per chunk)
+_MAX_CHUNKS = 13
+
+
+def _factor(precision: int) -> int:
+    if precision not in SUPPORTED_PRECISIONS:
+        raise ValueError(f"Unsupported polyline precision {precision} (expected one of {SUPPORTED_PRECISIONS})")
+    return 10 ** precision
+
+
+def _decode_values(raw: np.ndarray):
+    """
+    Decode a byte array into the flat sequence of signed (delta) integers it holds.
+    Also returns the per-byte "last byte of a value" mask, used to split batches.
+    """
+    if raw.size and (raw.min() < 63 or raw.max() > 126):
+        raise ValueError("Invalid character in encoded polyline")
+    b = raw - np.uint8(63)
+    ends = (b & 0x20) == 0
+    if b.size and not ends[-1]:
+        raise ValueError("Truncated encoded polyline")
+    if not b.size:
+        return np.zeros(0, dtype=np.int64), ends
+
+    # Start of every value and each byte's position inside its value
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    pos = np.arange(b.size, dtype=np.int64)
+    pos -= np.repeat(starts, np.diff(np.append(starts, b.size)))
+    if pos.max() >= _MAX_CHUNKS:
+        raise ValueError("Malformed encoded polyline")
+
+    vals = np.add.reduceat((b & 0x1f).astype(np.int64) << (5 * pos), starts)
+    # Zig-zag decode
+    return (vals >> 1) ^ -(vals & 1), ends
+
+
+def decode(encoded: str, precision: int = 5) -> np.ndarray:
+    """Decode one polyline into an (N, 2) float64 [lat, lng] array"""
+    return decode_many([encoded], precision)[0]
+
+
+def decode_many(encoded_list: Sequence[str], precision: int = 5) -> List[np.ndarray]:
+    """
+    Decode a batch of polylines in one vectorized pass.
+    Returns one (N_i, 2) float64 [lat, lng] array per input string.
+    """
+    factor = _factor(precision)
+    if not encoded_list:
+        return []
+
+    blobs = [s.encode('ascii') for s in encoded_list]
+    raw = np.frombuffer(b''.join(blobs), dtype=np.uint8)
+    deltas, terminal = _decode_values(raw)
+
+    # Number of values per polyline = number of terminal bytes in its slice
+    lengths = np.fromiter((len(blob) for blob in blobs), dtype=np.int64, count=len(blobs))
+    term_cum = np.concatenate(([0], np.cumsum(terminal)))
+    bounds = np.concatenate(([0], np.cumsum(lengths)))
+    counts = term_cum[bounds[1:]] - term_cum[bounds[:-1]]
+    if np.any(counts % 2):
+        raise ValueError("Encoded polyline has an odd number of values")
+
+    points = deltas.reshape(-1, 2)
+    totals = np.cumsum(points, axis=0)
+    # Deltas restart at every polyline: subtract the running total reached before each one
+    n_points = counts // 2
+    offsets = np.concatenate(([0], np.cumsum(n_points)))
+    before = np.vstack((np.zeros((1, 2), dtype=np.int64), totals))[offsets[:-1]]
+    coords = (totals - np.repeat(before, n_points, axis=0)) / factor
+
+    return [coords[offsets[k]:offsets[k + 1]] for k in range(len(blobs))]
+
+
+def delta_ints(coords, precision: int = 5) -> np.ndarray:
+    """
+    Flat int64 [lat0, lng0, dlat1, dlng1, ...]: coordinates scaled by 10**precision,
+    rounded half away from zero (like the reference encoder), then delta-encoded.
+    The first pair is absolute. This is the polyline payload before zig-zag/chunking.
+    """
+    factor = _factor(precision)
+    arr = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    ints = (np.sign(arr) * np.floor(np.abs(arr) * factor + 0.5)).astype(np.int64)
+    return np.diff(ints, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+
+
+def encode(coords, precision: int = 5) -> str:
+    """Encode an (N, 2) [lat, lng] array-like as a polyline string"""
+    deltas = delta_ints(coords, precision)
+    if deltas.size == 0:
+        return ""
+
+    zz = (deltas << 1) ^ (deltas >> 63)
+
+    # Only as many 5-bit chunk columns as the largest value needs
+    max_bits = int(zz.max()).bit_length() if zz.size else 0
+    k = np.arange(max(1, -(-max_bits // 5)), dtype=np.int64)
+    chunks = (zz[:, None] >> (5 * k)) & 0x1f
+    n_chunks = 1 + np.count_nonzero((zz[:, None] >> (5 * k[1:])) > 0, axis=1)
+    used = k < n_chunks[:, None]
+    more = k < (n_chunks - 1)[:, None]
+    out = (chunks | np.where(more, 0x20, 0)) + 63
+    return out[used].astype(np.uint8).tobytes().decode('ascii')
+
+
+def encode_many(coords_list, precision: int = 5) -> List[str]:
+    return [encode(coords, precision) for coords in coords_list]
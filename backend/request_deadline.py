@@ -0,0 +1,64 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Optional
+
+# Below this much remaining budget a stage is skipped rather than started
+MIN_STAGE_S = 0.25
+
+
+class Deadline:
+    """Absolute end time for one request; every stage asks it how long it may take"""
+
+    def __init__(self, budget_s: float):
+        self.budget_s = budget_s
+        self.expires_at = time.monotonic() + budget_s
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() < MIN_STAGE_S
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(budget_s: float):
+    """Sets the request-scoped deadline for everything called (or submitted via submit_in_context) inside"""
+    token = _current.set(Deadline(budget_s))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def stage_timeout(cap_s: float) -> Optional[float]:
+    """
+    Timeout for the next outbound call: the stage's own cap, clipped to the remaining budget.
+    Returns None when the budget is (nearly) spent and the stage should be skipped.
+    Without an active deadline (scripts, tests) the cap is returned unchanged.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return cap_s
+    remaining = deadline.remaining()
+    if remaining < MIN_STAGE_S:
+        return None
+    return min(cap_s, remaining)
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left for the current request, or None when no deadline is set"""
+    deadline = _current.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """executor.submit that carries the caller's deadline (contextvars) into the worker thread"""
+    return executor.submit(copy_context().run, fn, *args, **kwargs)
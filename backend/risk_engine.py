@@ -1,13 +1,37 @@
-import requests
 import json
 import math
 import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+import numpy as np
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 from firebase_service import firebase_svc # Integration
+from zone_set import ZoneSet, compile_zone_set
+# Scoring lives in a Firebase-free module so process-pool workers can import it cheaply
+from route_scoring import SafetyResult, assess_route, analyze_route_safety
+from scoring_pool import score_routes
+from route_geometry import RouteGeometry
+from route_cache import route_cache
+from segment_risk import SNAPPED_NODE
+from detour_planner import plan_detours
+from route_fingerprint import dedupe_indices, is_duplicate
+from local_router import local_router
 
 # --- Models ---
-from services.ors_service import get_ors_route
+from services.ors_service import ors_route_cache_key, request_ors_route
+from services.provider_clients import http_get
+from services.provider_hedging import direct_route_hedge
+from services.provider_health import provider_health, healthy_status
+from request_deadline import stage_timeout, remaining_budget, submit_in_context
+
+# Shared pool for concurrent provider calls (direct + detours of several requests)
+ROUTE_FETCH_WORKERS = int(os.getenv("ROUTE_FETCH_WORKERS", "16"))
+_FETCH_POOL = ThreadPoolExecutor(max_workers=ROUTE_FETCH_WORKERS, thread_name_prefix="route-fetch")
+# Per-call cap for routing providers; the request deadline may clip it further
+PROVIDER_TIMEOUT_S = float(os.getenv("PROVIDER_TIMEOUT_S", "10"))
+# Scores below this are SAFE/GREEN; a direct route under it that enters no zone may skip alternatives
+SAFE_SCORE_THRESHOLD = 40
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "1") != "0"
 
 # --- Models ---
 class RouteRequest(BaseModel):
@@ -16,6 +40,7 @@ class RouteRequest(BaseModel):
     time_of_day: str  # "day" or "night"
     crowd_density: str # "low", "medium", "high"
     travel_mode: str = "driving" # driving, walking, cycling, transit
+    alternatives: bool = False # False: a clean direct route is returned alone (see FAST_PATH_ENABLED)
 
 class RouteResponse(BaseModel):
     route_id: str
@@ -25,11 +50,13 @@ class RouteResponse(BaseModel):
     risk_level: str
     color: str
     details: List[str]
-    geometry: List[List[float]]
+    geometry: Union[List[List[float]], str, List[int]] # [[lat, lng], ...] unless geometry_format says otherwise
+    geometry_format: str = "json" # See route_geometry.GEOMETRY_FORMATS
     duration_min: int
     duration_text: str
     distance_text: str
     tradeoff_text: Optional[str] = None
+    exposure_m: float = 0.0 # Meters of the route running inside risk/accidental zones
     tags: List[str] = []
     steps: List[Dict[str, str]] = []
 
@@ -73,36 +100,43 @@ def get_coordinates(place_name: str):
     print(f"DEBUG: Geocode failed for '{place_name}'")
     return None
 
-def fetch_google_route(start, end, mode="driving"):
-    """Fetch premium route from Google Directions API"""
-    key = os.getenv("GOOGLE_MAPS_API_KEY")
-    if not key or "AIza" not in key:
-        return None
-        
-    g_mode = "driving"
-    if mode == "walking": g_mode = "walking"
-    elif mode == "cycling": g_mode = "bicycling"
-    
-    url = f"https://maps.googleapis.com/maps/api/directions/json"
-    params = {
-        "origin": f"{start[0]},{start[1]}",
-        "destination": f"{end[0]},{end[1]}",
-        "mode": g_mode,
-        "key": key,
-        "alternatives": "true"
-    }
-    
-    try:
-        resp = requests.get(url, params=params, timeout=10)
-        if resp.status_code == 200:
-            data = resp.json()
-            if data['status'] == "OK":
-                return data
-    except Exception as e:
-        print(f"Google Route Error: {e}")
-    return None
+def _adapt_osrm_geometry(route):
+    """
+    Replace an OSRM GeoJSON geometry ([lng, lat]) with a RouteGeometry, in place.
+    Leg node annotations (annotations=nodes) become route['node_ids'], one OSM node id per
+    geometry vertex, when they line up with the geometry (see segment_risk).
+    route['snapped_idx'] lists the vertices OSRM snapped onto an edge (origin, via points,
+    destination); their node ids are SNAPPED_NODE so the partial segments around them are
+    scored geometrically and never cached as whole road segments.
+    """
+    geometry = route.get('geometry')
+    if isinstance(geometry, dict):
+        route['geometry'] = RouteGeometry.from_lnglat(geometry.get('coordinates', []))
+
+    node_ids = []
+    snapped_idx = [0]
+    for leg in route.get('legs', []):
+        nodes = (leg.pop('annotation', None) or {}).get('nodes') or []
+        # Consecutive legs share the via point
+        node_ids.extend(nodes[1:] if node_ids else nodes)
+        snapped_idx.append(max(len(node_ids) - 1, 0))
+    if node_ids and isinstance(route.get('geometry'), RouteGeometry) and len(node_ids) == len(route['geometry'].coords):
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        node_ids[snapped_idx] = SNAPPED_NODE
+        route['node_ids'] = node_ids
+        route['snapped_idx'] = snapped_idx
+    return route
 
 def fetch_osrm_route(start_coords, end_coords, mode="driving", options=None):
+    """OSRM route (optionally with alternatives); cached per snapped endpoints, treat as read-only"""
+    alternatives = bool(options and options.get('alternatives'))
+    return route_cache.get_or_fetch(_osrm_cache_key(start_coords, end_coords, mode, alternatives),
+                                    lambda: _request_osrm_route(start_coords, end_coords, mode, alternatives))
+
+def _osrm_cache_key(start_coords, end_coords, mode, alternatives=False):
+    return route_cache.key("osrm", mode, (start_coords, end_coords), options=alternatives)
+
+def _request_osrm_route(start_coords, end_coords, mode, alternatives):
     # OSRM Mapping
     osrm_mode = "driving"
     if mode == "walking": osrm_mode = "walking"
@@ -113,86 +147,31 @@ def fetch_osrm_route(start_coords, end_coords, mode="driving", options=None):
     end_str = f"{end_coords[1]},{end_coords[0]}"
     url = f"http://router.project-osrm.org/route/v1/{osrm_mode}/{start_str};{end_str}"
     
-    params = {'overview': 'full', 'geometries': 'geojson', 'steps': 'true'}
-    if options and options.get('alternatives'):
+    params = {'overview': 'full', 'geometries': 'geojson', 'steps': 'true', 'annotations': 'nodes'}
+    if alternatives:
         params['alternatives'] = 'true'
+    
+    timeout = stage_timeout(PROVIDER_TIMEOUT_S)
+    if timeout is None:
+        print("DEBUG: Skipping OSRM route (request deadline reached)")
+        return None
+    if not provider_health.allow("osrm", "route"):
+        print("DEBUG: Skipping OSRM route (circuit open)")
+        return None
         
     try:
-        response = requests.get(url, params=params)
+        with provider_health.track("osrm", "route") as outcome:
+            response = http_get(url, params=params, timeout=timeout)
+            outcome.ok = healthy_status(response.status_code)
         if response.status_code == 200:
-            return response.json()
+            data = response.json()
+            for route in data.get('routes', []):
+                _adapt_osrm_geometry(route)
+            return data
     except Exception as e:
         print(f"OSRM Request failed: {e}")
     return None
 
-def analyze_route_safety(coords, zones, time_of_day, crowd_density, mode):
-    risk_score = 15
-    reasons = []
-    
-    if mode == "walking":
-        risk_score += 15
-        if time_of_day == "night":
-            risk_score += 20
-            reasons.append("High vulnerability (Walking at Night)")
-    elif mode == "cycling":
-        risk_score += 10
-        if time_of_day == "night":
-            reasons.append("Low visibility for cyclists")
-    elif mode == "transit":
-        risk_score += 5 # Generally safer than walking
-        if time_of_day == "night":
-            reasons.append("Wait times at stops may be risky")
-    
-    for zone in zones:
-        zone_hit = False
-        min_dist_found = 9999
-        
-        # Improved sampling frequency for better detection accuracy
-        # Check EVERY point for debugging accuracy
-        for point in coords: 
-            # Guard against malformed zone data
-            if 'lat' not in zone or 'lng' not in zone: continue
-            
-            dist = haversine(point[0], point[1], zone['lat'], zone['lng'])
-            if dist < min_dist_found: min_dist_found = dist
-            
-            # Normalize Radius to KM for comparison (Haversine returns KM)
-            radius_km = 1.0 # Default
-            if 'radius_meters' in zone:
-                radius_km = zone['radius_meters'] / 1000.0
-            elif 'radius_km' in zone:
-                radius_km = zone['radius_km']
-            
-            if dist < radius_km:
-                zone_hit = True
-                print(f"!!! ALERT: Zone HIT '{zone.get('name')}' Dist: {dist:.3f}km < Radius: {radius_km:.3f}km")
-                break # Count zone only once per route
-        
-        # print(f"DEBUG: Checked '{zone.get('name')}'. Min Dist: {min_dist_found:.3f}km")
-
-        if zone_hit:
-            reason = f"Near {zone['name']}"
-            if zone.get('reason'): reason += f" ({zone['reason']})"
-            if reason not in reasons: reasons.append(reason)
-            
-            zone_risk = zone.get('risk_level', 'MEDIUM')
-            print(f"!!! RISK ADDED: {zone_risk} for {zone.get('name')}")
-            
-            if zone_risk == "HIGH":
-                risk_score += 50 # Was 40 - Increased to guarantee Red
-                if time_of_day == "night":
-                    risk_score += 20
-                    reasons.append("Night-time Danger Zone")
-            else:
-                risk_score += 30 # Was 20 - Increased to guarantee Red (15+30=45)
-                
-    if time_of_day == "night": risk_score += 10
-    if crowd_density == "low": risk_score += 10
-    
-    final_score = min(99, max(5, risk_score))
-    print(f"DEBUG: Final Route Score: {final_score}")
-    return final_score, list(set(reasons))
-
 def extract_steps(route_data):
     steps = []
     if 'legs' in route_data:
@@ -229,196 +208,291 @@ def calculate_bearing(lat1, lon1, lat2, lon2):
     brng = math.degrees(math.atan2(y, x))
     return (brng + 360) % 360
 
-def get_detour_point(zone_lat, zone_lng, radius_km, start_lat, start_lng, end_lat, end_lng):
-    """
-    Calculates a waypoint to bypass a danger zone.
-    We determine the general direction of travel and offset the zone center perpendicular to it.
-    """
-    # Simple check: Are we moving mostly North/South or East/West?
-    lat_diff = abs(end_lat - start_lat)
-    lng_diff = abs(end_lng - start_lng)
-    
-    offset_deg = (radius_km * 1.5) / 111.0 # Rough conversion to degrees
-    
-    # If moving North/South, detour East or West
-    if lat_diff > lng_diff:
-        # Try West first
-        return (zone_lat, zone_lng - offset_deg)
-    else:
-        # Moving East/West, detour North or South
-        # Try North
-        return (zone_lat + offset_deg, zone_lng)
-
-def fetch_detour_route(start, end, waypoint, mode):
-    """Fetches a route passing through a waypoint"""
+def fetch_via_route(start, end, waypoints, mode):
+    """Fetches a route passing through the waypoints in order (cached like fetch_osrm_route)"""
+    key = route_cache.key("osrm_via", mode, (start, *waypoints, end))
+    return route_cache.get_or_fetch(key, lambda: _request_via_route(start, end, waypoints, mode))
+
+def _request_via_route(start, end, waypoints, mode):
     osrm_mode = "driving"
     if mode == "walking": osrm_mode = "walking"
     
     # Coordinates for OSRM are Lng,Lat
     start_str = f"{start[1]},{start[0]}"
     end_str = f"{end[1]},{end[0]}"
-    way_str = f"{waypoint[1]},{waypoint[0]}" # Waypoint
+    way_str = ";".join(f"{wp[1]},{wp[0]}" for wp in waypoints) # Waypoints
     
     url = f"http://router.project-osrm.org/route/v1/{osrm_mode}/{start_str};{way_str};{end_str}"
-    params = {'overview': 'full', 'geometries': 'geojson', 'steps': 'true'}
+    params = {'overview': 'full', 'geometries': 'geojson', 'steps': 'true', 'annotations': 'nodes'}
+    
+    timeout = stage_timeout(PROVIDER_TIMEOUT_S)
+    if timeout is None:
+        print("DEBUG: Skipping detour route (request deadline reached)")
+        return None
+    if not provider_health.allow("osrm", "route"):
+        print("DEBUG: Skipping detour route (circuit open)")
+        return None
     
     try:
-        response = requests.get(url, params=params)
+        with provider_health.track("osrm", "route") as outcome:
+            response = http_get(url, params=params, timeout=timeout)
+            outcome.ok = healthy_status(response.status_code)
         if response.status_code == 200:
             data = response.json()
             if 'routes' in data and len(data['routes']) > 0:
-                return data['routes'][0]
+                return _adapt_osrm_geometry(data['routes'][0])
     except: pass
     return None
 
 # --- STRICT DUAL-PATH STRATEGY ---
 
-# --- BOW-SHAPE MULTI-ROUTE STRATEGY ---
+def _has_routes(data):
+    return bool(data) and bool(data.get('routes'))
 
-def get_offset_point(start_lat, start_lng, end_lat, end_lng, offset_ratio=0.2, direction="left"):
+def fetch_direct_route(start_coords, end_coords, mode):
     """
-    Calculates a waypoint perpendicular to the direct path to create a 'bow' shape.
-    offset_ratio: how far out to bow (relative to total distance)
+    Direct route from ORS (Standardized) / OSRM, hedged or raced per DIRECT_ROUTE_HEDGE_MODE.
+    ORS is preferred; the registry demotes or drops whichever provider is unhealthy.
+    The route cache is checked before hedging, so only real network calls are hedged
+    (and timed): a cache hit returns at once, including one from a provider whose
+    circuit is open.
     """
-    # 1. Coordinate math
-    d_lat = end_lat - start_lat
-    d_lng = end_lng - start_lng
-    
-    # Midpoint
-    mid_lat = start_lat + d_lat * 0.5
-    mid_lng = start_lng + d_lng * 0.5
-    
-    # Perpendicular Vector (-90 or +90 deg rotation)
-    # Simple planar approximation is sufficient for local routing
-    if direction == "left":
-        perp_lat = -d_lng
-        perp_lng = d_lat
-    else:
-        perp_lat = d_lng
-        perp_lng = -d_lat
-        
-    # Normalize and Scale
-    mag = math.sqrt(perp_lat**2 + perp_lng**2)
-    if mag == 0: return (mid_lat, mid_lng)
-    
-    scale = offset_ratio
-    # Adjust for Latitude stretching if needed, but simple ratio works for visual separation
-    
-    way_lat = mid_lat + (perp_lat / mag) * abs(d_lat) * scale  # Scale relative to lat diff roughly
-    way_lng = mid_lng + (perp_lng / mag) * abs(d_lng) * scale
-    
-    # Better Scaling: Use total euclidean distance in deg
-    total_dist_deg = math.sqrt(d_lat**2 + d_lng**2)
-    offset_dist_deg = total_dist_deg * offset_ratio
-    
-    way_lat = mid_lat + (perp_lat / mag) * offset_dist_deg
-    way_lng = mid_lng + (perp_lng / mag) * offset_dist_deg
-    
-    return (way_lat, way_lng)
+    keys = {
+        "ors": ors_route_cache_key(start_coords, end_coords, mode),
+        "osrm": _osrm_cache_key(start_coords, end_coords, mode),
+    }
+    uncached = {
+        "ors": lambda: request_ors_route(start_coords, end_coords, mode),
+        "osrm": lambda: _request_osrm_route(start_coords, end_coords, mode, False),
+    }
+    order = provider_health.rank("route", list(keys))
+    # Rank order only sets the preference: providers left out (open circuit) still serve from cache
+    cached = route_cache.get_any([keys[name] for name in order + [n for n in keys if n not in order]],
+                                 is_valid=_has_routes)
+    if cached is not None:
+        return cached
+
+    def fetcher(name):
+        def fetch():
+            result = uncached[name]()
+            route_cache.put(keys[name], result)
+            return result
+        return fetch
 
-def get_dual_routes(start_coords, end_coords, mode, zones, context):
+    return direct_route_hedge.call([(name, fetcher(name)) for name in order], is_valid=_has_routes)
+
+def _future_result(future, label):
+    try:
+        # Never wait past the request deadline (None = no deadline set)
+        return future.result(timeout=remaining_budget())
+    except FuturesTimeout:
+        print(f"{label} fetch abandoned: request deadline reached")
+        return None
+    except Exception as e:
+        print(f"{label} fetch failed: {e}")
+        return None
+
+def _novel_indices(accepted, new):
     """
-    Generates routes using 'Bow-Shape' Logic to force geometric diversity.
-    Ensures at least TWO routes are returned even if geometry is similar.
+    Indices into `new` (RouteGeometry list) of routes that are not near-duplicates of an
+    accepted route or of each other, judged by geometry fingerprint (cells not shared)
     """
-    start_lng, start_lat = start_coords[1], start_coords[0]
-    end_lng, end_lat = end_coords[1], end_coords[0]
-    
-    candidates = []
-    
-    # 1. DIRECT ROUTE (Best quality available)
-    print("DEBUG: fetching Direct Route (Prioritizing Google/ORS)...")
-    direct_raw = None
-    
-    # Try Google First
-    google_data = fetch_google_route(start_coords, end_coords, mode)
-    if google_data:
-        # Google returns a different format, we need to adapt it briefly
-        # or just try ORS which is already adapted.
-        # For simplicity in this engine, we use ORS as the primary adapted premium source.
-        pass
+    fps = [g.fingerprint for g in accepted] + [g.fingerprint for g in new]
+    return [k - len(accepted) for k in dedupe_indices(fps, keep_first=len(accepted))[len(accepted):]]
 
-    # Try ORS (Standardized)
-    direct_raw = get_ors_route(start_coords, end_coords, mode)
+def _add_candidates(candidates, scored, new, zones, context, mode):
+    """
+    Scores `new` (detours, the local risk-aware route) in one batch and appends them to candidates.
+    These exist to avoid zones, so one is only dropped after scoring: when its geometry is a
+    near-duplicate of a kept candidate and it enters exactly the same zones.
+    """
+    if not new:
+        return
+    new_scored = score_routes([c['route']['geometry'].coords for c in new], zones, context['time'], context['crowd'], mode,
+                              [c['route'].get('node_ids') for c in new])
+    for cand, safety in zip(new, new_scored):
+        fp = cand['route']['geometry'].fingerprint
+        if any(set(safety.hit_zones) == set(s.hit_zones) and is_duplicate(fp, c['route']['geometry'].fingerprint)
+               for c, s in zip(candidates, scored)):
+            continue
+        candidates.append(cand)
+        scored.append(safety)
+
+def _processed_route(source, route, safety):
+    return {
+        "source": source,
+        "route": route,
+        "geometry": route['geometry'],
+        "score": safety.score,
+        "details": safety.details,
+        "exposure_m": safety.exposure_m,
+        "duration": route['duration'],
+        "distance": route['distance']
+    }
+
+def _route_response(p, route_id, type_label, summary, tags, geometry_format="json"):
+    # Special Case: If High Risk, override Safe tag
+    level, color = ("SAFE", "GREEN") if p['score'] < SAFE_SCORE_THRESHOLD else ("MEDIUM", "YELLOW")
+    if p['score'] >= 75: 
+        level, color = "HIGH", "RED"
+        # It can be Safest AND High Risk (if no other choice)
+
+    # Built from values this module already produced: skip re-validating every geometry coordinate
+    return RouteResponse.model_construct(
+        route_id=route_id,
+        type=type_label, # Frontend ignores this for color now
+        summary=summary,
+        risk_score=p['score'],
+        risk_level=level,
+        color=color,
+        details=p['details'],
+        geometry=p['geometry'].encode(geometry_format),
+        geometry_format=geometry_format,
+        duration_min=int(p['duration'] / 60),
+        duration_text=format_travel_time(p['duration']),
+        distance_text=f"{p['distance']/1000:.1f} km",
+        tags=tags,
+        steps=extract_steps(p['route']),
+        exposure_m=round(p['exposure_m'], 1)
+    )
+
+def get_dual_routes(start_coords, end_coords, mode, zones, context, alternatives=True, on_event=None,
+                    geometry_format="json"):
+    """
+    Generates candidate routes from the provider's own alternatives (ORS alternative_routes),
+    then plans detours only around the zones the direct route actually enters.
+    Ensures at least TWO routes are returned even if geometry is similar, unless
+    alternatives=False and the direct route is already clean (fast path, single route).
+
+    on_event(name, payload), if given, is called from this thread as results become available:
+    ("route", {"candidate": k, "route": RouteResponse}) for each route as soon as it is scored
+    (provisional id and tags), then once ("ranking", {"routes": [...]}) mapping every candidate
+    to its final route_id, type, summary and tags. Routes are then delivered through the events
+    only and the returned list is empty.
+    geometry_format: wire format of each route's geometry (route_geometry.GEOMETRY_FORMATS).
+    """
+    print("DEBUG: fetching Direct Route (ORS with alternatives, OSRM hedge)...")
+    direct_future = submit_in_context(_FETCH_POOL, fetch_direct_route, start_coords, end_coords, mode)
     
-    # Fallback to OSRM
-    if not direct_raw:
-        direct_raw = fetch_osrm_route(start_coords, end_coords, mode)
-        
+    candidates = []
+    emitted = []  # Processed routes already streamed through on_event
+    
+    def emit_routes(entries):
+        if on_event is None:
+            return
+        for p in entries:
+            p['candidate'] = len(emitted)
+            emitted.append(p)
+            summary = "Direct" if p['source'] == "direct" else "Alternative"
+            on_event("route", {"candidate": p['candidate'],
+                               "route": _route_response(p, f"c_{p['source']}_{p['candidate']}", "fast", summary, [],
+                                                        geometry_format)})
+    
+    def emit_scored():
+        if on_event is not None:
+            emit_routes([_processed_route(c['type'], c['route'], safety)
+                         for c, safety in list(zip(candidates, scored))[len(emitted):]])
+    
+    # 1. DIRECT ROUTE (Best quality available) + provider alternatives from the same response
+    direct_raw = _future_result(direct_future, "Direct")
     if direct_raw and 'routes' in direct_raw:
-        r = direct_raw['routes'][0]
-        candidates.append({"type": "direct", "route": r})
-            
-    # 2. BOW LEFT (Force deviation - 30% offset)
-    left_wp = get_offset_point(start_lat, start_lng, end_lat, end_lng, 0.3, "left")
-    print(f"DEBUG: fetching Left Bow via {left_wp}...")
-    left_raw = fetch_detour_route(start_coords, end_coords, left_wp, mode)
-    if left_raw:
-        candidates.append({"type": "left_bow", "route": left_raw})
-
-    # 3. BOW RIGHT (Force deviation - 30% offset)
-    right_wp = get_offset_point(start_lat, start_lng, end_lat, end_lng, 0.3, "right")
-    print(f"DEBUG: fetching Right Bow via {right_wp}...")
-    right_raw = fetch_detour_route(start_coords, end_coords, right_wp, mode)
-    if right_raw:
-        candidates.append({"type": "right_bow", "route": right_raw})
-        
-    # --- Process Candidates (Looser Dedup) ---
-    processed_routes = []
-    
-    for cand in candidates:
-        r = cand['route']
-        # Decode Geometry
-        coords_lnglat = r['geometry']['coordinates']
-        coords_latlng = [[p[1], p[0]] for p in coords_lnglat]
-        
-        # Risk Analysis
-        score, details = analyze_route_safety(coords_latlng, zones, context['time'], context['crowd'], mode)
+        routes = direct_raw['routes']
+        candidates.append({"type": "direct", "route": routes[0]})
+        for r in routes[1:]:
+            candidates.append({"type": "provider_alt", "route": r})
+        # Drop near-identical geometries before any scoring work
+        candidates = [candidates[k] for k in _novel_indices([], [c['route']['geometry'] for c in candidates])]
+    elif local_router.enabled:
+        # Providers unavailable: plain fastest route from the in-process router (no-op outside its extract)
+        local_raw = local_router.route(start_coords, end_coords, mode, risk_aware=False)
+        if local_raw:
+            candidates.append({"type": "direct", "route": local_raw['routes'][0]})
+    
+    # Compile once (no-op if the caller already passed a ZoneSet) and share across candidates
+    zones = zones if isinstance(zones, ZoneSet) else compile_zone_set(zones)
+    
+    # Risk Analysis: the direct route first, it decides how much more work is needed
+    scored = score_routes([c['route']['geometry'].coords for c in candidates[:1]], zones, context['time'], context['crowd'], mode,
+                          [c['route'].get('node_ids') for c in candidates[:1]])
+    emit_scored()
+    
+    # FAST PATH: clean direct route and the client did not ask for alternatives
+    fast_path = (FAST_PATH_ENABLED and not alternatives and bool(candidates)
+                 and scored[0].score < SAFE_SCORE_THRESHOLD and not scored[0].hit_zones)
+    if fast_path:
+        print("DEBUG: Direct route is clean, returning it alone (fast path)")
+        candidates = candidates[:1]
+    elif len(candidates) > 1:
+        # Provider alternatives (batched so the optional process pool can score them in parallel)
+        scored += score_routes([c['route']['geometry'].coords for c in candidates[1:]], zones, context['time'], context['crowd'], mode,
+                               [c['route'].get('node_ids') for c in candidates[1:]])
+        emit_scored()
+    
+    # 2. LOCAL RISK-WEIGHTED ROUTE: one in-process A* that prices zone exposure (LOCAL_ROUTER_ENABLED)
+    if not fast_path and local_router.enabled and candidates and all(s.hit_zones for s in scored):
+        local_raw = local_router.route(start_coords, end_coords, mode, zones, risk_aware=True)
+        if local_raw:
+            _add_candidates(candidates, scored, [{"type": "local_safe", "route": local_raw['routes'][0]}],
+                            zones, context, mode)
+            emit_scored()
+    
+    # 3. ZONE-AWARE DETOURS: bypass the (merged) zones the direct route hits,
+    #    unless an alternative is already clean. Clean routes cost no extra fetch.
+    if not fast_path and candidates and scored[0].hit_zones and all(s.hit_zones for s in scored):
+        plans = plan_detours(candidates[0]['route']['geometry'].coords, zones, scored[0].hit_zones,
+                             start_coords, end_coords)
+        print(f"DEBUG: Direct route hits {len(scored[0].hit_zones)} zone(s), fetching {len(plans)} detour(s)...")
+        futures = {submit_in_context(_FETCH_POOL, fetch_via_route, start_coords, end_coords, wps, mode): wps
+                   for wps in plans}
+        if on_event is not None:
+            # Streaming: score and push each detour as soon as its fetch completes
+            try:
+                for future in as_completed(futures, timeout=remaining_budget()):
+                    wps = futures[future]
+                    detour_raw = _future_result(future, f"Detour via {wps}")
+                    if detour_raw:
+                        _add_candidates(candidates, scored, [{"type": "detour" if len(wps) == 1 else "multi_detour",
+                                                              "route": detour_raw}], zones, context, mode)
+                        emit_scored()
+            except FuturesTimeout:
+                print("Detour fetches abandoned: request deadline reached")
+        else:
+            detours = []
+            for future, wps in futures.items():
+                detour_raw = _future_result(future, f"Detour via {wps}")
+                if detour_raw:
+                    detours.append({"type": "detour" if len(wps) == 1 else "multi_detour", "route": detour_raw})
+            _add_candidates(candidates, scored, detours, zones, context, mode)
         
-        # Check Uniqueness (Distance/Duration based)
-        is_unique = True
-        for existing in processed_routes:
-            # Stricter uniquess: If distance is almost EXACTLY same (1% diff), assume duplicate
-            dist_diff = abs(existing['distance'] - r['distance'])
-            if dist_diff < (existing['distance'] * 0.01): # 1% tolerance
-                is_unique = False
-                break
-        
-        if is_unique:
-            processed_routes.append({
-                "source": cand['type'],
-                "route": r,
-                "coords": coords_latlng,
-                "score": score,
-                "details": details,
-                "duration": r['duration'],
-                "distance": r['distance']
-            })
+    # --- Process Candidates (duplicates already dropped, see _novel_indices / _add_candidates) ---
+    processed_routes = emitted if on_event is not None else []
+    for cand, safety in list(zip(candidates, scored))[len(processed_routes):]:
+        processed_routes.append(_processed_route(cand['type'], cand['route'], safety))
 
     # --- FALLBACK: If only 1 route found, try Hard Alternatives ---
-    if len(processed_routes) < 2:
+    if len(processed_routes) < 2 and not fast_path:
         print("DEBUG: Only 1 route found. Forcing Hard Alternatives...")
         # Start/End are reversed for OSRM sometimes to find diff path? No.
         # Try `alternatives=true` on standard fetch as last resort
         alt_raw = fetch_osrm_route(start_coords, end_coords, mode, options={'alternatives': True})
         if alt_raw and 'routes' in alt_raw:
-            for r in alt_raw['routes'][1:]: # Skip first as it's likely the direct one
-                 coords_lnglat = r['geometry']['coordinates']
-                 coords_latlng = [[p[1], p[0]] for p in coords_lnglat]
-                 score, details = analyze_route_safety(coords_latlng, zones, context['time'], context['crowd'], mode)
-                 processed_routes.append({
-                    "source": "fallback_alt",
-                    "route": r,
-                    "coords": coords_latlng,
-                    "score": score,
-                    "details": details,
-                    "duration": r['duration'],
-                    "distance": r['distance']
-                })
-                 if len(processed_routes) >= 2: break
+            # Skip routes we already have (usually the first one); only take as many as needed to reach 2
+            alt_routes = alt_raw['routes']
+            novel = _novel_indices([p['geometry'] for p in processed_routes], [r['geometry'] for r in alt_routes])
+            alt_routes = [alt_routes[k] for k in novel][:2 - len(processed_routes)]
+            alt_scored = score_routes([r['geometry'].coords for r in alt_routes], zones, context['time'], context['crowd'], mode,
+                                      [r.get('node_ids') for r in alt_routes])
+            fallback = [_processed_route("fallback_alt", r, safety) for r, safety in zip(alt_routes, alt_scored)]
+            if on_event is not None:
+                emit_routes(fallback)
+            else:
+                processed_routes += fallback
 
     # --- Tagging ---
-    if not processed_routes: return []
+    if not processed_routes:
+        if on_event is not None:
+            on_event("ranking", {"routes": []})
+        return []
     
     # Sort by Score (Safest first)
     processed_routes.sort(key=lambda x: x['score'])
@@ -426,7 +500,7 @@ def get_dual_routes(start_coords, end_coords, mode, zones, context):
     # Identify Fastest
     min_dur = min(p['duration'] for p in processed_routes)
     
-    results = []
+    ranked = []
     for idx, p in enumerate(processed_routes):
         tags = []
         is_safest = (idx == 0) # Sorted by score
@@ -446,42 +520,26 @@ def get_dual_routes(start_coords, end_coords, mode, zones, context):
             tags.append("Alternative")
             type_label = "fast"
 
-        # Special Case: If High Risk, override Safe tag
-        level, color = ("SAFE", "GREEN") if p['score'] < 40 else ("MEDIUM", "YELLOW")
-        if p['score'] >= 75: 
-            level, color = "HIGH", "RED"
-            # It can be Safest AND High Risk (if no other choice)
-            if "Safest" in tags: pass 
-
-        results.append(RouteResponse(
-            route_id=f"r_{p['source']}_{idx}",
-            type=type_label, # Frontend ignores this for color now
-            summary=tags[0],
-            risk_score=p['score'],
-            risk_level=level,
-            color=color,
-            details=p['details'],
-            geometry=p['coords'],
-            duration_min=int(p['duration'] / 60),
-            duration_text=format_travel_time(p['duration']),
-            distance_text=f"{p['distance']/1000:.1f} km",
-            tags=tags,
-            steps=extract_steps(p['route'])
-        ))
-
-    return results
-
-def calculate_route_risk(request: RouteRequest) -> List[RouteResponse]:
+        ranked.append((p, f"r_{p['source']}_{idx}", type_label, tags))
+
+    if on_event is not None:
+        # Every route was already streamed: the ranking only carries labels, no response is rebuilt
+        on_event("ranking", {"routes": [{"candidate": p['candidate'], "route_id": route_id, "type": type_label,
+                                         "summary": tags[0], "tags": tags}
+                                        for p, route_id, type_label, tags in ranked]})
+        return []
+    return [_route_response(p, route_id, type_label, tags[0], tags, geometry_format)
+            for p, route_id, type_label, tags in ranked]
+
+def calculate_route_risk(request: RouteRequest, on_event=None, geometry_format="json") -> List[RouteResponse]:
     start_coords = get_coordinates(request.origin)
     end_coords = get_coordinates(request.destination)
     if not start_coords or not end_coords: return []
     
-    risk_zones = firebase_svc.get_risk_zones()
-    accidental_zones = firebase_svc.get_accidental_zones()
-    
-    # Combine lists (accidental zones will have risk_level=MEDIUM which adds +30 score)
-    all_zones = risk_zones + accidental_zones
+    # Combined risk + accidental zones (accidental zones are MEDIUM, +30 score), compiled per data version
+    zone_set = firebase_svc.get_zone_set()
     
     context = {"time": request.time_of_day, "crowd": request.crowd_density}
     
-    return get_dual_routes(start_coords, end_coords, request.travel_mode, all_zones, context)
+    return get_dual_routes(start_coords, end_coords, request.travel_mode, zone_set, context,
+                           alternatives=request.alternatives, on_event=on_event, geometry_format=geometry_format)
@@ -0,0 +1,153 @@
+import math
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from route_geometry import RouteGeometry
+from route_simplify import M_PER_DEG
+
+# Endpoints (origin / destination / waypoint) are snapped to this grid before keying,
+# so requests a few metres apart share one provider response
+ROUTE_CACHE_SNAP_M = float(os.getenv("ROUTE_CACHE_SNAP_M", "50"))
+ROUTE_CACHE_TTL_S = float(os.getenv("ROUTE_CACHE_TTL_S", "900"))
+ROUTE_CACHE_MAX_MB = float(os.getenv("ROUTE_CACHE_MAX_MB", "64"))
+ROUTE_CACHE_ENABLED = os.getenv("ROUTE_CACHE_ENABLED", "1") != "0"
+
+
+def _estimate_bytes(value) -> int:
+    """Rough in-memory size of a provider response (dicts/lists of scalars + geometry arrays)"""
+    if isinstance(value, RouteGeometry):
+        return value.coords.nbytes + 64
+    if isinstance(value, np.ndarray):
+        return value.nbytes + 96
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_bytes(k) + _estimate_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_estimate_bytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class RouteCache:
+    """
+    TTL + LRU cache of routing provider responses.
+
+    Keys are (provider, mode, options, snapped points); entries expire after ttl_s
+    and the least recently used ones are evicted once the estimated size exceeds
+    the memory budget. Cached responses are shared, so callers must treat them as
+    read-only (RouteGeometry arrays already are).
+    """
+
+    def __init__(self, snap_m: float = ROUTE_CACHE_SNAP_M, ttl_s: float = ROUTE_CACHE_TTL_S,
+                 max_bytes: int = int(ROUTE_CACHE_MAX_MB * 1024 * 1024), enabled: bool = ROUTE_CACHE_ENABLED):
+        self.snap_m = snap_m
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, object]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def snap(self, lat: float, lng: float) -> Tuple[int, int]:
+        """Grid cell of a point; the longitude step widens with latitude to stay ~snap_m"""
+        step_lat = self.snap_m / M_PER_DEG
+        i = int(math.floor(lat / step_lat))
+        cos_lat = max(math.cos(math.radians((i + 0.5) * step_lat)), 1e-6)
+        return i, int(math.floor(lng * cos_lat / step_lat))
+
+    def key(self, provider: str, mode: str, points: Sequence[Sequence[float]], options: Hashable = None) -> Tuple:
+        """points are (lat, lng) pairs in request order: origin, [waypoints...], destination"""
+        return (provider, mode, options) + tuple(self.snap(p[0], p[1]) for p in points)
+
+    def _lookup(self, key, now: float) -> Optional[object]:
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, size, value = entry
+        if now - stored_at > self.ttl_s:
+            del self._entries[key]
+            self._bytes -= size
+            self.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key) -> Optional[object]:
+        return self.get_any([key])
+
+    def get_any(self, keys: Sequence[Hashable], is_valid: Callable[[object], bool] = None) -> Optional[object]:
+        """
+        First cached value among keys (in preference order) that passes is_valid, e.g. the
+        same route from any of several providers. Counts as one hit or one miss.
+        """
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                value = self._lookup(key, now)
+                if value is not None and (is_valid is None or is_valid(value)):
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if not self.enabled or value is None:
+            return
+        size = _estimate_bytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (time.monotonic(), size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_fetch(self, key, fetch: Callable[[], object]):
+        """Cached response for key, or fetch() and cache it (failures, i.e. None, are not cached)"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        value = fetch()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "snap_m": self.snap_m,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+route_cache = RouteCache()
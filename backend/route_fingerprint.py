@@ -0,0 +1,87 @@
+"""
+Cheap geometry fingerprints for route candidates.
+
+A route is reduced to the set of grid cells it passes through (~200 m cells) and
+summarised by a fixed-size MinHash signature of that set. Signature agreement
+estimates the Jaccard similarity of the cell sets, and the signature digest is
+stable enough to serve as a cache key.
+
+Duplicates are judged on the exact cell sets instead: two routes are the same
+candidate only when at most a few cells are not shared. A ratio such as Jaccard
+would call a long route and its bypass around one small zone duplicates, since
+the bypass changes a fixed number of cells however long the rest of the route is.
+"""
+import hashlib
+import os
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+
+from zone_hit_cache import route_cells
+
+FINGERPRINT_CELL_DEG = float(os.getenv("FINGERPRINT_CELL_DEG", "0.002"))
+FINGERPRINT_HASHES = 64
+# Routes with at most this many cells not shared between them (~200 m each) are duplicates
+FINGERPRINT_DUP_MAX_CELLS = int(os.getenv("FINGERPRINT_DUP_MAX_CELLS", "2"))
+
+# Fixed seeds so signatures are comparable across requests and processes
+_SEEDS = np.random.default_rng(0x5AFE).integers(1, 2 ** 63, size=FINGERPRINT_HASHES, dtype=np.uint64)
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finaliser (uint64 arithmetic wraps, which is what we want)"""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class RouteFingerprint(NamedTuple):
+    signature: np.ndarray  # (FINGERPRINT_HASHES,) uint64 MinHash of the route's cells
+    n_cells: int
+    cells: np.ndarray  # Sorted unique packed cell ids (uint64)
+
+    def similarity(self, other: "RouteFingerprint") -> float:
+        """Estimated Jaccard similarity of the two routes' cell sets (0..1)"""
+        if self.n_cells == 0 or other.n_cells == 0:
+            return 1.0 if self.n_cells == other.n_cells else 0.0
+        return float(np.count_nonzero(self.signature == other.signature)) / len(self.signature)
+
+    def distinct_cells(self, other: "RouteFingerprint") -> int:
+        """Number of cells crossed by exactly one of the two routes"""
+        return len(np.setxor1d(self.cells, other.cells, assume_unique=True))
+
+    @property
+    def key(self) -> str:
+        return hashlib.blake2b(self.signature.tobytes(), digest_size=8).hexdigest()
+
+
+def fingerprint_route(route, cell_deg: float = FINGERPRINT_CELL_DEG) -> RouteFingerprint:
+    """Fingerprint of an (N, 2) [lat, lng] polyline"""
+    route = np.asarray(route, dtype=np.float64).reshape(-1, 2)
+    cells = route_cells(route, cell_deg)
+    if len(cells) == 0:
+        return RouteFingerprint(np.full(FINGERPRINT_HASHES, np.iinfo(np.uint64).max, dtype=np.uint64), 0,
+                                np.zeros(0, dtype=np.uint64))
+
+    with np.errstate(over='ignore'):
+        packed = (cells[:, 0].astype(np.uint64) << np.uint64(32)) ^ (cells[:, 1].astype(np.uint64) & np.uint64(0xFFFFFFFF))
+        signature = _mix64(packed[:, None] ^ _SEEDS[None, :]).min(axis=0)
+    return RouteFingerprint(signature, len(cells), np.unique(packed))
+
+
+def is_duplicate(a: RouteFingerprint, b: RouteFingerprint, max_cells: int = FINGERPRINT_DUP_MAX_CELLS) -> bool:
+    return a.distinct_cells(b) <= max_cells
+
+
+def dedupe_indices(fingerprints: Sequence[RouteFingerprint], keep_first: int = 0,
+                   max_cells: int = FINGERPRINT_DUP_MAX_CELLS) -> List[int]:
+    """
+    Indices of the fingerprints to keep, in order: each one is dropped if at most
+    `max_cells` cells separate it from one already kept. The first `keep_first`
+    entries are kept unconditionally (already accepted routes).
+    """
+    kept: List[int] = []
+    for k, fp in enumerate(fingerprints):
+        if k < keep_first or not any(is_duplicate(fp, fingerprints[j], max_cells) for j in kept):
+            kept.append(k)
+    return kept
@@ -0,0 +1,82 @@
+import numpy as np
+from typing import List, Sequence, Union
+
+import polyline_codec
+from route_fingerprint import RouteFingerprint, fingerprint_route
+
+# Wire formats for route geometry in API responses ("json" is the original [[lat, lng], ...] shape)
+#   polyline5 / polyline6: Google encoded polyline string at 1e-5 / 1e-6 degrees
+#   delta5 / delta6:       flat int list [lat0, lng0, dlat1, dlng1, ...] scaled by 1e5 / 1e6
+GEOMETRY_FORMATS = ("json", "polyline5", "polyline6", "delta5", "delta6")
+
+
+class RouteGeometry:
+    """
+    Route polyline stored as one contiguous (N, 2) float64 array.
+
+    Axis order is always [lat, lng] (see AXIS_ORDER), whatever the provider sent:
+    adapters convert GeoJSON/OSRM [lng, lat] once on ingest, and scoring and
+    serialization read the array directly instead of rebuilding lists of lists.
+    """
+
+    __slots__ = ('coords', '_fingerprint')
+    AXIS_ORDER = ('lat', 'lng')
+
+    def __init__(self, coords: np.ndarray):
+        coords = np.ascontiguousarray(coords, dtype=np.float64).reshape(-1, 2)
+        coords.flags.writeable = False
+        self.coords = coords
+        self._fingerprint = None
+
+    @classmethod
+    def from_lnglat(cls, points: Sequence[Sequence[float]]) -> "RouteGeometry":
+        """From GeoJSON / OSRM ordered [[lng, lat], ...]"""
+        arr = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return cls(arr[:, ::-1])
+
+    @classmethod
+    def from_latlng(cls, points: Sequence[Sequence[float]]) -> "RouteGeometry":
+        """From [[lat, lng], ...] (e.g. decoded Google polylines)"""
+        return cls(np.asarray(points, dtype=np.float64))
+
+    @property
+    def lat(self) -> np.ndarray:
+        return self.coords[:, 0]
+
+    @property
+    def lng(self) -> np.ndarray:
+        return self.coords[:, 1]
+
+    @property
+    def fingerprint(self) -> RouteFingerprint:
+        """MinHash cell fingerprint (see route_fingerprint); computed once, cached responses share it"""
+        if self._fingerprint is None:
+            self._fingerprint = fingerprint_route(self.coords)
+        return self._fingerprint
+
+    def __len__(self):
+        return len(self.coords)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.coords if dtype is None else self.coords.astype(dtype)
+
+    def to_latlng_list(self) -> List[List[float]]:
+        """JSON-ready [[lat, lng], ...] (single C-level conversion)"""
+        return self.coords.tolist()
+
+    def to_lnglat_list(self) -> List[List[float]]:
+        return self.coords[:, ::-1].tolist()
+
+    def encode(self, fmt: str = "json") -> Union[List[List[float]], str, List[int]]:
+        """Geometry in one of GEOMETRY_FORMATS"""
+        if fmt == "json":
+            return self.to_latlng_list()
+        if fmt not in GEOMETRY_FORMATS:
+            raise ValueError(f"Unsupported geometry format {fmt!r} (expected one of {GEOMETRY_FORMATS})")
+        precision = int(fmt[-1])
+        if fmt.startswith("polyline"):
+            return polyline_codec.encode(self.coords, precision)
+        return polyline_codec.delta_ints(self.coords, precision).tolist()
+
+    def __repr__(self):
+        return f"RouteGeometry(points={len(self)})"
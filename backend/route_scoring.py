@@ -0,0 +1,150 @@
+import os
+import numpy as np
+from typing import List, NamedTuple, Tuple
+from zone_set import ZoneSet, Severity, compile_zone_set
+from geo_kernels import as_route_array, route_zone_hits, polyline_zone_distance_km, segment_zone_exposure_km
+from route_simplify import simplify_route
+from zone_hit_cache import zone_cell_memo
+from segment_risk import segment_risk_table
+
+# Douglas-Peucker tolerance applied to long geometries before zone matching (meters, 0 disables)
+SIMPLIFY_TOLERANCE_M = float(os.getenv("ROUTE_SIMPLIFY_TOLERANCE_M", "15"))
+SIMPLIFY_MIN_POINTS = int(os.getenv("ROUTE_SIMPLIFY_MIN_POINTS", "200"))
+
+def _candidate_zone_ids(route, zone_set):
+    """
+    Zones that could possibly be hit by the route.
+    Long geometries are simplified first; every original point lies within the tolerance
+    of the simplified polyline, so inflating zone radii by that tolerance cannot miss a hit.
+    Cells the route passes through are resolved via the shared memo (see zone_hit_cache).
+    """
+    if len(route) < SIMPLIFY_MIN_POINTS or SIMPLIFY_TOLERANCE_M <= 0:
+        return zone_cell_memo.candidates(zone_set, route)
+    
+    coarse = simplify_route(route, SIMPLIFY_TOLERANCE_M)
+    pad_km = SIMPLIFY_TOLERANCE_M / 1000.0
+    ids = zone_cell_memo.candidates(zone_set, coarse, pad_km)
+    if len(ids) == 0:
+        return ids
+    
+    dist = polyline_zone_distance_km(coarse, zone_set.lat[ids], zone_set.lng[ids], zone_set.cos_lat[ids])
+    # Small relative slack covers the planar approximation in the coarse filter
+    keep = dist < (zone_set.radius_km[ids] + pad_km) * 1.01 + 0.001
+    print(f"DEBUG: Simplified route {len(route)} -> {len(coarse)} pts, {int(keep.sum())}/{len(ids)} zones near")
+    return ids[keep]
+
+def _geometric_exposure(route, zone_set):
+    """(candidate zone ids, KM inside each, hit mask) from the route geometry alone"""
+    candidate_ids = _candidate_zone_ids(route, zone_set)
+    
+    # Exact segment-vs-circle pass on the full geometry, only for the surviving candidates.
+    # A zone counts as hit when any part of the route (not just a vertex) runs through it.
+    radius_km = zone_set.radius_km[candidate_ids]
+    if len(route) >= 2:
+        exposure_km = segment_zone_exposure_km(route, zone_set.lat[candidate_ids], zone_set.lng[candidate_ids],
+                                               zone_set.cos_lat[candidate_ids], radius_km)
+        hits = exposure_km > 0
+    else:
+        # Single-point geometry: nothing to intersect, fall back to the vertex test
+        hits, _ = route_zone_hits(route, zone_set.lat_rad[candidate_ids], zone_set.lng_rad[candidate_ids],
+                                  zone_set.cos_lat[candidate_ids], radius_km)
+        exposure_km = np.zeros(len(candidate_ids))
+    return candidate_ids, exposure_km, hits
+
+def _stationary_hits(route, zone_set):
+    """
+    Zones containing a repeated vertex (zero-length segment, e.g. origin == destination).
+    Such segments have no length inside any zone, so the exposure pass alone cannot see them.
+    """
+    stationary = route[1:][np.all(route[1:] == route[:-1], axis=1)]
+    if len(stationary) == 0:
+        return np.zeros(0, dtype=np.intp)
+    ids = np.asarray(zone_set.index.candidate_zones_for_points(stationary), dtype=np.intp)
+    if len(ids) == 0:
+        return ids
+    hits, _ = route_zone_hits(stationary, zone_set.lat_rad[ids], zone_set.lng_rad[ids],
+                              zone_set.cos_lat[ids], zone_set.radius_km[ids])
+    return ids[hits]
+
+class SafetyResult(NamedTuple):
+    score: int
+    details: List[str]
+    exposure_m: float        # Meters of route inside zones (summed per zone)
+    hit_zones: Tuple[int, ...]  # ZoneSet indices of the zones the route enters
+
+def assess_route(coords, zones, time_of_day, crowd_density, mode, node_ids=None) -> SafetyResult:
+    """
+    node_ids: optional OSM node id per route vertex (OSRM / local router). When they line
+    up with the geometry, zone exposure comes from the road-segment table instead of the
+    geometric pass.
+    """
+    risk_score = 15
+    reasons = []
+    
+    if mode == "walking":
+        risk_score += 15
+        if time_of_day == "night":
+            risk_score += 20
+            reasons.append("High vulnerability (Walking at Night)")
+    elif mode == "cycling":
+        risk_score += 10
+        if time_of_day == "night":
+            reasons.append("Low visibility for cyclists")
+    elif mode == "transit":
+        risk_score += 5 # Generally safer than walking
+        if time_of_day == "night":
+            reasons.append("Wait times at stops may be risky")
+    
+    # Zones are compiled once per data version; plain dict lists are still accepted
+    zone_set = zones if isinstance(zones, ZoneSet) else compile_zone_set(zones)
+    
+    route = as_route_array(coords)
+    if node_ids is not None and len(route) >= 2 and len(node_ids) == len(route):
+        candidate_ids, exposure_km = segment_risk_table.route_exposure(zone_set, np.asarray(node_ids, dtype=np.int64), route)
+        hits = exposure_km > 0
+    else:
+        candidate_ids, exposure_km, hits = _geometric_exposure(route, zone_set)
+    if len(route) >= 2:
+        extra = np.setdiff1d(_stationary_hits(route, zone_set), candidate_ids[hits])
+        if len(extra):
+            candidate_ids = np.concatenate((np.asarray(candidate_ids, dtype=np.intp), extra))
+            exposure_km = np.concatenate((exposure_km, np.zeros(len(extra))))
+            hits = np.concatenate((hits, np.ones(len(extra), dtype=bool)))
+            order = np.argsort(candidate_ids, kind='stable')
+            candidate_ids, exposure_km, hits = candidate_ids[order], exposure_km[order], hits[order]
+    radius_km = zone_set.radius_km[candidate_ids]
+    
+    hit_zones = []
+    for k in np.flatnonzero(hits).tolist():
+        idx = int(candidate_ids[k])
+        hit_zones.append(idx)
+        name = zone_set.names[idx]
+        print(f"!!! ALERT: Zone HIT '{name}' Exposure: {exposure_km[k] * 1000:.0f}m (Radius: {radius_km[k]:.3f}km)")
+
+        reason = f"Near {name}"
+        if zone_set.reasons[idx]: reason += f" ({zone_set.reasons[idx]})"
+        if reason not in reasons: reasons.append(reason)
+        
+        severity = Severity(zone_set.severity[idx])
+        print(f"!!! RISK ADDED: {severity.name} for {name}")
+        
+        if severity == Severity.HIGH:
+            risk_score += 50 # Was 40 - Increased to guarantee Red
+            if time_of_day == "night":
+                risk_score += 20
+                reasons.append("Night-time Danger Zone")
+        else:
+            risk_score += 30 # Was 20 - Increased to guarantee Red (15+30=45)
+                
+    if time_of_day == "night": risk_score += 10
+    if crowd_density == "low": risk_score += 10
+    
+    final_score = min(99, max(5, risk_score))
+    exposure_m = float(exposure_km.sum()) * 1000.0
+    print(f"DEBUG: Final Route Score: {final_score} (Zone exposure: {exposure_m:.0f}m)")
+    return SafetyResult(final_score, list(set(reasons)), exposure_m, tuple(hit_zones))
+
+def analyze_route_safety(coords, zones, time_of_day, crowd_density, mode):
+    """Returns (score, details); see assess_route for exposure and hit zones"""
+    result = assess_route(coords, zones, time_of_day, crowd_density, mode)
+    return result.score, result.details
@@ -0,0 +1,65 @@
+import numpy as np
+
+# Metres per degree of latitude on the same sphere as geo_kernels.haversine_km
+M_PER_DEG = 6371000.0 * np.pi / 180.0
+
+
+def project_local_m(route: np.ndarray) -> np.ndarray:
+    """Equirectangular projection of [lat, lng] degrees to metres around the route's mean latitude"""
+    cos_ref = np.cos(np.radians(route[:, 0].mean()))
+    return np.column_stack((route[:, 1] * cos_ref * M_PER_DEG, route[:, 0] * M_PER_DEG))
+
+
+def simplify_indices(route: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """
+    Douglas-Peucker simplification of an (N, 2) [lat, lng] array.
+
+    Returns the indices of the vertices to keep (first and last always kept).
+    Every dropped vertex - and therefore every point of the original polyline -
+    lies within tolerance_m of the simplified polyline.
+    """
+    n = len(route)
+    if n < 3 or tolerance_m <= 0:
+        return np.arange(n)
+
+    xy = project_local_m(route)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    # Level by level: every open span (a, b) of the recursion is measured in one batched pass
+    a = np.array([0])
+    b = np.array([n - 1])
+    while len(a):
+        inner = b - a - 1
+        a, b, inner = a[inner > 0], b[inner > 0], inner[inner > 0]
+        if len(a) == 0:
+            break
+        offsets = np.cumsum(inner) - inner  # Start of each span's points in the flat arrays
+        span = np.repeat(np.arange(len(a)), inner)
+        idx = a[span] + 1 + np.arange(len(span)) - offsets[span]
+
+        seg = (xy[b] - xy[a])[span]
+        pts = xy[idx] - xy[a[span]]
+        seg_len2 = np.einsum("ij,ij->i", seg, seg)
+        # Distance to the segment (clamped), not the infinite line, so the bound holds for loops too
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.where(seg_len2 > 0, np.clip(np.einsum("ij,ij->i", pts, seg) / seg_len2, 0.0, 1.0), 0.0)
+        off = pts - t[:, None] * seg
+        dist = np.hypot(off[:, 0], off[:, 1])
+
+        # Farthest point of each span (first one on ties)
+        peak = np.maximum.reduceat(dist, offsets)
+        at_peak = np.flatnonzero(dist == peak[span])
+        peak_span = span[at_peak]
+        first = at_peak[np.concatenate(([True], peak_span[1:] != peak_span[:-1]))]
+        split = peak > tolerance_m
+        mid = idx[first][split]
+        keep[mid] = True
+        a, b = np.concatenate((a[split], mid)), np.concatenate((mid, b[split]))
+
+    return np.flatnonzero(keep)
+
+
+def simplify_route(route: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """Simplified copy of the route (see simplify_indices)"""
+    return route[simplify_indices(route, tolerance_m)]
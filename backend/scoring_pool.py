@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+import numpy as np
+
+from geo_kernels import as_route_array
+from route_scoring import SafetyResult, assess_route
+from zone_set import ZoneSet
+
+# "inline" scores in the request thread; "process" offloads to a pool of worker processes
+SCORING_BACKEND = os.getenv("SCORING_BACKEND", "inline").lower()
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", str(os.cpu_count() or 2)))
+# Below this many route vertices per batch the IPC round-trip costs more than it saves
+SCORING_POOL_MIN_POINTS = int(os.getenv("SCORING_POOL_MIN_POINTS", "2000"))
+
+# --- Worker side ---
+
+_worker_zone_set: Optional[ZoneSet] = None
+
+
+def _init_worker(zone_set: ZoneSet):
+    """Runs once per worker process: the compiled ZoneSet is shipped here, not with every call"""
+    global _worker_zone_set
+    _worker_zone_set = zone_set
+
+
+def _score_in_worker(version, route, time_of_day, crowd_density, mode) -> SafetyResult:
+    if _worker_zone_set is None or _worker_zone_set.version != version:
+        raise RuntimeError(f"Worker zone set is stale (wanted {version})")
+    return assess_route(route, _worker_zone_set, time_of_day, crowd_density, mode)
+
+
+# --- Parent side ---
+
+class ScoringPool:
+    """
+    Optional process pool for CPU-bound route scoring.
+    One pool is kept per zone data version; when the zones change the pool is
+    replaced so workers never score against stale data.
+    """
+
+    def __init__(self, workers: int = SCORING_WORKERS):
+        self.workers = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _executor_for(self, zone_set: ZoneSet) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._version != zone_set.version:
+                if self._executor is not None:
+                    # Let requests still scoring against the old version drain
+                    self._executor.shutdown(wait=False)
+                print(f"DEBUG: Starting scoring pool ({self.workers} workers) for zones {zone_set.version}")
+                # spawn: forking a threaded server process is unsafe, and it matches Windows dev boxes
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(zone_set,),
+                )
+                self._version = zone_set.version
+            return self._executor
+
+    def _reset(self, broken: Optional[ProcessPoolExecutor] = None):
+        """Drops the pool (only if it is still `broken`, when given: a newer pool is left alone)"""
+        with self._lock:
+            if self._executor is None or (broken is not None and self._executor is not broken):
+                return
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._version = None
+
+    def score(self, routes: List[np.ndarray], zone_set: ZoneSet, time_of_day, crowd_density, mode) -> List[SafetyResult]:
+        executor = self._executor_for(zone_set)
+        futures = []
+        for route in routes:
+            try:
+                futures.append(executor.submit(_score_in_worker, zone_set.version, route, time_of_day, crowd_density, mode))
+            except RuntimeError:
+                # Pool was replaced (zones changed) between lookup and submit: score in-process
+                futures.append(None)
+        results = []
+        for route, future in zip(routes, futures):
+            try:
+                if future is None:
+                    raise RuntimeError("scoring pool was replaced")
+                results.append(future.result())
+            except Exception as e:
+                # Score this one in-process; only a broken pool is torn down (stale/cancelled work is not a pool fault)
+                print(f"Scoring pool error, falling back to in-process: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    self._reset(executor)
+                results.append(assess_route(route, zone_set, time_of_day, crowd_density, mode))
+        return results
+
+    def shutdown(self):
+        self._reset()
+
+
+scoring_pool = ScoringPool()
+
+
+def score_routes(coords_list, zone_set: ZoneSet, time_of_day, crowd_density, mode,
+                 node_ids_list=None) -> List[SafetyResult]:
+    """
+    Scores several candidate geometries against the same zones.
+    Routes with OSM node ids (node_ids_list, None entries allowed) are scored in-process
+    from the road-segment table; the rest use the process pool when SCORING_BACKEND=process
+    and the batch is big enough, otherwise they are scored in-process too.
+    """
+    routes = [as_route_array(coords) for coords in coords_list]
+    node_ids_list = list(node_ids_list) if node_ids_list is not None else [None] * len(routes)
+    results: List[Optional[SafetyResult]] = [None] * len(routes)
+
+    geometric = []
+    for k, (route, node_ids) in enumerate(zip(routes, node_ids_list)):
+        if node_ids is not None and len(node_ids) == len(route):
+            results[k] = assess_route(route, zone_set, time_of_day, crowd_density, mode, node_ids)
+        else:
+            geometric.append(k)
+
+    pending = [routes[k] for k in geometric]
+    total_points = sum(len(route) for route in pending)
+    if SCORING_BACKEND == "process" and total_points >= SCORING_POOL_MIN_POINTS:
+        scored = scoring_pool.score(pending, zone_set, time_of_day, crowd_density, mode)
+    else:
+        scored = [assess_route(route, zone_set, time_of_day, crowd_density, mode) for route in pending]
+    for k, result in zip(geometric, scored):
+        results[k] = result
+    return results
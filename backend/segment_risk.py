@@ -0,0 +1,175 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from geo_kernels import MAX_BATCH_PAIRS, segments_inside_km
+from zone_set import ZoneSet
+
+# Upper bound on cached road segments (cleared wholesale when exceeded or when zones change)
+SEGMENT_RISK_MAX = int(os.getenv("SEGMENT_RISK_MAX", "2000000"))
+# Local graph edges precomputed per batch (the batch is stored before the next starts)
+SEGMENT_PRECOMPUTE_BATCH = 50_000
+
+# OSM node ids fit in 40 bits for the foreseeable future; two of them make one int key
+_ID_BITS = 40
+
+SegmentValue = Tuple[Tuple[int, float], ...]  # ((zone index, KM inside), ...), empty for clean segments
+
+# Node id placed at snapped route vertices (origin, destination, via points): the segments
+# touching one are only part of a road edge, so they are never looked up or stored
+SNAPPED_NODE = -1
+
+
+def segment_key(a: int, b: int) -> int:
+    """Undirected key of the road segment between two OSM nodes"""
+    if a > b:
+        a, b = b, a
+    return (a << _ID_BITS) | b
+
+
+class SegmentRiskTable:
+    """
+    Road segment (pair of OSM node ids) -> zone exposure of that segment.
+
+    Routes that carry node ids (OSRM annotations=nodes, local router) are scored
+    with one dict lookup per segment instead of geometric zone tests. Segments are
+    filled lazily from the first route that uses them, or from the local road graph
+    in a background thread, and the whole table is dropped when the zone data
+    version changes.
+    """
+
+    def __init__(self, max_segments: int = SEGMENT_RISK_MAX):
+        self.max_segments = max_segments
+        self._version: Optional[str] = None
+        self._table: Dict[int, SegmentValue] = {}
+        self._graphs_done = set()  # Local graph profiles already precomputed for this version
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.precomputed = 0
+
+    def _sync(self, zone_set: ZoneSet):
+        # Imported here: only graphs the local router has already loaded are used
+        from local_router import local_router
+        with self._lock:
+            if self._version != zone_set.version:
+                self._table = {}
+                self._graphs_done = set()
+                self._version = zone_set.version
+            graphs = [g for g in local_router.loaded_graphs() if g.profile not in self._graphs_done]
+            self._graphs_done.update(g.profile for g in graphs)
+        if graphs:
+            # Off the request path: routes keep filling the table lazily meanwhile
+            threading.Thread(target=self._precompute_from_local_graphs, args=(zone_set, graphs),
+                             name="segment-risk-precompute", daemon=True).start()
+
+    def _precompute_from_local_graphs(self, zone_set: ZoneSet, graphs):
+        for graph in graphs:
+            a = graph.node_ids[graph.edge_src]
+            b = graph.node_ids[graph.indices]
+            starts = np.column_stack((graph.lat[graph.edge_src], graph.lng[graph.edge_src]))
+            ends = np.column_stack((graph.lat[graph.indices], graph.lng[graph.indices]))
+            stored = 0
+            for s in range(0, len(a), SEGMENT_PRECOMPUTE_BATCH):
+                with self._lock:
+                    if self._version != zone_set.version:
+                        return  # Zone data changed meanwhile; the new version schedules its own pass
+                batch = slice(s, s + SEGMENT_PRECOMPUTE_BATCH)
+                stored += len(self.insert_segments(zone_set, a[batch], b[batch], starts[batch], ends[batch]))
+            with self._lock:
+                self.precomputed += stored
+            print(f"DEBUG: Segment risk table precomputed {stored} road segments from local graph ({graph.profile})")
+
+    def insert_segments(self, zone_set: ZoneSet, a_ids, b_ids, starts: np.ndarray, ends: np.ndarray) -> Dict[int, SegmentValue]:
+        """Computes and stores the exposure of the given segments in batched passes"""
+        values = self._compute(zone_set, starts, ends)
+        keys = [segment_key(int(a), int(b)) for a, b in zip(np.asarray(a_ids).tolist(), np.asarray(b_ids).tolist())]
+        computed = dict(zip(keys, values))
+        with self._lock:
+            if self._version == zone_set.version:
+                if len(self._table) + len(computed) > self.max_segments:
+                    self._table = {}
+                self._table.update(computed)
+        return computed
+
+    @staticmethod
+    def _compute(zone_set: ZoneSet, starts: np.ndarray, ends: np.ndarray):
+        n = len(starts)
+        values = [()] * n
+        if n == 0 or len(zone_set) == 0:
+            return values
+
+        # Segments grouped by grid cell, each group tested only against the zones near it
+        for rows, ids in zone_set.index.segment_groups(starts, ends):
+            chunk = max(1, MAX_BATCH_PAIRS // len(ids))
+            for s in range(0, len(rows), chunk):
+                part = rows[s:s + chunk]
+                inside = segments_inside_km(starts[part], ends[part], zone_set.lat[ids], zone_set.lng[ids],
+                                            zone_set.cos_lat[ids], zone_set.radius_km[ids])
+                for row, col in zip(*np.nonzero(inside > 0)):
+                    k = int(part[row])
+                    values[k] = values[k] + ((int(ids[col]), float(inside[row, col])),)
+        return values
+
+    def route_exposure(self, zone_set: ZoneSet, node_ids: np.ndarray, route: np.ndarray):
+        """
+        Per-zone exposure of a route whose vertices are the given OSM nodes.
+        Returns (zone indices, KM inside each), like the geometric path in route_scoring.
+        Partial segments (the first and last, and any touching a SNAPPED_NODE vertex such as
+        a via point) start or end mid-edge, so they are computed geometrically and never stored.
+        """
+        self._sync(zone_set)
+        n_seg = len(node_ids) - 1
+        partial = (node_ids[:-1] < 0) | (node_ids[1:] < 0)
+        partial[[0, n_seg - 1]] = True
+        keys = [segment_key(a, b) if not p else None
+                for a, b, p in zip(node_ids[:-1].tolist(), node_ids[1:].tolist(), partial.tolist())]
+
+        values = [None] * n_seg
+        missing = []
+        with self._lock:
+            for k, key in enumerate(keys):
+                value = self._table.get(key) if key is not None else None
+                if value is None:
+                    missing.append(k)
+                else:
+                    values[k] = value
+            self.hits += n_seg - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            idx = np.asarray(missing)
+            full = idx[~partial[idx]]
+            if len(full):
+                stored = self.insert_segments(zone_set, node_ids[full], node_ids[full + 1], route[full], route[full + 1])
+                for k in full.tolist():
+                    values[k] = stored[keys[k]]
+            cut = idx[partial[idx]]
+            for k, value in zip(cut.tolist(), self._compute(zone_set, route[cut], route[cut + 1])):
+                values[k] = value
+
+        totals: Dict[int, float] = {}
+        for value in values:
+            for zone, km in value:
+                totals[zone] = totals.get(zone, 0.0) + km
+        zone_ids = np.array(sorted(totals), dtype=np.intp)
+        return zone_ids, np.array([totals[z] for z in zone_ids.tolist()], dtype=np.float64)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "segments": len(self._table),
+                "max_segments": self.max_segments,
+                "zone_version": self._version,
+                "precomputed": self.precomputed,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Shared instance (per process)
+segment_risk_table = SegmentRiskTable()
@@ -1,58 +1,93 @@
 import os
-import requests
-import googlemaps
+from services.provider_clients import GMAPS_CALL_MAX_S, http_get, get_gmaps_client, gmaps_fits_budget
+from services.provider_health import provider_health, healthy_status
+from request_deadline import stage_timeout
 from typing import Dict, List, Optional
 
 # Load keys
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 ORS_API_KEY = os.getenv("ORS_API_KEY")
 
+# Preferred order (most accurate first); provider_health may demote or skip entries at runtime
+GEOCODE_PROVIDERS = ("google", "ors", "nominatim")
+
+def _has_google_key() -> bool:
+    return bool(GOOGLE_MAPS_API_KEY) and "AIza" in GOOGLE_MAPS_API_KEY
+
+def _geocode_google(query: str) -> Optional[Dict]:
+    # googlemaps only has client-wide timeouts: skip the call unless a whole one fits the deadline
+    if not _has_google_key():
+        return None
+    if not gmaps_fits_budget():
+        print(f"⚠️ Google Geocode skipped for '{query}': under {GMAPS_CALL_MAX_S:.0f}s of request budget left")
+        return None
+    gmaps = get_gmaps_client(GOOGLE_MAPS_API_KEY)
+    with provider_health.track("google", "geocode"):
+        res = gmaps.geocode(query)
+    if res:
+        loc = res[0]['geometry']['location']
+        print(f"✅ Google Maps Geocode Success: {query}")
+        return {'lat': loc['lat'], 'lng': loc['lng'], 'source': 'google'}
+    return None
+
+def _geocode_ors(query: str, timeout: float) -> Optional[Dict]:
+    if not ORS_API_KEY:
+        return None
+    url = "https://api.openrouteservice.org/geocode/search"
+    params = {"api_key": ORS_API_KEY, "text": query, "size": 1}
+    with provider_health.track("ors", "geocode") as outcome:
+        resp = http_get(url, params=params, timeout=timeout)
+        outcome.ok = healthy_status(resp.status_code)
+    if resp.status_code == 200:
+        data = resp.json()
+        if data.get('features'):
+            coords = data['features'][0]['geometry']['coordinates']
+            print(f"✅ ORS Geocode Success: {query}")
+            return {'lat': coords[1], 'lng': coords[0], 'source': 'ors'}
+    return None
+
+def _geocode_nominatim(query: str, timeout: float) -> Optional[Dict]:
+    headers = {'User-Agent': 'SafeRouteApp/1.0'}
+    url = f"https://nominatim.openstreetmap.org/search?format=json&q={query}&limit=1"
+    with provider_health.track("nominatim", "geocode") as outcome:
+        resp = http_get(url, headers=headers, timeout=timeout)
+        outcome.ok = healthy_status(resp.status_code)
+    if resp.status_code == 200 and len(resp.json()) > 0:
+        loc = resp.json()[0]
+        print(f"✅ Nominatim Geocode Success: {query}")
+        return {'lat': float(loc['lat']), 'lng': float(loc['lon']), 'source': 'nominatim'}
+    return None
+
+_GEOCODERS = {
+    "google": (_geocode_google, "Google Geocode Error"),
+    "ors": (_geocode_ors, "ORS Geocode Error"),
+    "nominatim": (_geocode_nominatim, "Nominatim Fallback Error"),
+}
+
 def geocode_location(query: str) -> Optional[Dict]:
     """
     Highly robust geocoder that prioritizes Google Maps, 
     then falls back to OpenRouteService, then Nominatim.
+    Unhealthy providers are moved down or skipped (see provider_health).
     """
     if not query:
         return None
 
-    # 1. Google Maps (Primary & Most Accurate)
-    if GOOGLE_MAPS_API_KEY and "AIza" in GOOGLE_MAPS_API_KEY:
+    for name in provider_health.rank("geocode", GEOCODE_PROVIDERS):
+        # Each provider only runs if the request still has budget left (see request_deadline)
+        timeout = stage_timeout(5)
+        if timeout is None:
+            print(f"⚠️ Geocode skipped for '{query}': request deadline reached")
+            return None
+        if not provider_health.allow(name, "geocode"):
+            continue
+        geocode, error_label = _GEOCODERS[name]
         try:
-            gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
-            res = gmaps.geocode(query)
-            if res:
-                loc = res[0]['geometry']['location']
-                print(f"✅ Google Maps Geocode Success: {query}")
-                return {'lat': loc['lat'], 'lng': loc['lng'], 'source': 'google'}
+            result = geocode(query) if name == "google" else geocode(query, timeout)
+            if result:
+                return result
         except Exception as e:
-            print(f"⚠️ Google Geocode Error: {e}")
-
-    # 2. OpenRouteService (Secondary)
-    if ORS_API_KEY:
-        try:
-            url = "https://api.openrouteservice.org/geocode/search"
-            params = {"api_key": ORS_API_KEY, "text": query, "size": 1}
-            resp = requests.get(url, params=params, timeout=5)
-            if resp.status_code == 200:
-                data = resp.json()
-                if data.get('features'):
-                    coords = data['features'][0]['geometry']['coordinates']
-                    print(f"✅ ORS Geocode Success: {query}")
-                    return {'lat': coords[1], 'lng': coords[0], 'source': 'ors'}
-        except Exception as e:
-            print(f"⚠️ ORS Geocode Error: {e}")
-
-    # 3. Nominatim (Free Fallback)
-    try:
-        headers = {'User-Agent': 'SafeRouteApp/1.0'}
-        url = f"https://nominatim.openstreetmap.org/search?format=json&q={query}&limit=1"
-        resp = requests.get(url, headers=headers, timeout=5)
-        if resp.status_code == 200 and len(resp.json()) > 0:
-            loc = resp.json()[0]
-            print(f"✅ Nominatim Geocode Success: {query}")
-            return {'lat': float(loc['lat']), 'lng': float(loc['lon']), 'source': 'nominatim'}
-    except Exception as e:
-        print(f"⚠️ Nominatim Fallback Error: {e}")
+            print(f"⚠️ {error_label}: {e}")
 
     return None
 
@@ -61,10 +96,11 @@ def search_places(query: str) -> List[Dict]:
     Search for multiple places matching query.
     """
     # Prefer Google Places if possible
-    if GOOGLE_MAPS_API_KEY and "AIza" in GOOGLE_MAPS_API_KEY:
+    if _has_google_key() and gmaps_fits_budget() and provider_health.allow("google", "search"):
         try:
-            gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
-            res = gmaps.places(query)
+            gmaps = get_gmaps_client(GOOGLE_MAPS_API_KEY)
+            with provider_health.track("google", "search"):
+                res = gmaps.places(query)
             if res and res.get('results'):
                 results = []
                 for p in res['results'][:5]:
@@ -1,8 +1,9 @@
 
-import googlemaps
+from services.provider_clients import get_gmaps_client
 import os
-import polyline_decoder # We will create this local util since 'polyline' package might not be installed
+import polyline_codec # Local vectorized codec (no dependency on the 'polyline' package)
 from datetime import datetime
+from route_geometry import RouteGeometry
 
 def get_google_route(origin_str, destination_str, mode="driving"):
     key = os.getenv("GOOGLE_MAPS_API_KEY")
@@ -11,7 +12,7 @@ def get_google_route(origin_str, destination_str, mode="driving"):
         return None
     
     try:
-        gmaps = googlemaps.Client(key=key)
+        gmaps = get_gmaps_client(key)
         
         # Map modes
         g_mode = "driving"
@@ -39,15 +40,12 @@ def _adapt_google_to_osrm(g_data):
     if not g_data:
         return None
         
+    # 1. Decode all overview polylines in one batch; Google is already (lat, lng) ordered
+    paths = polyline_codec.decode_many([g['overview_polyline']['points'] for g in g_data])
+    
     routes = []
-    for g_route in g_data:
-        # 1. Decode Polyline
-        # Google returns encoded string. We need [[lng, lat]]
-        encoded = g_route['overview_polyline']['points']
-        path = polyline_decoder.decode(encoded) # Returns [(lat, lng)]
-        
-        # Convert to [[lng, lat]] for OSRM/GeoJSON compatibility
-        geometry = [[lng, lat] for lat, lng in path]
+    for g_route, path in zip(g_data, paths):
+        geometry = RouteGeometry(path)
         
         leg = g_route['legs'][0]
         
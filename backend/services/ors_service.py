@@ -1,7 +1,11 @@
 import os
-import requests
 import json
 from dotenv import load_dotenv
+from route_geometry import RouteGeometry
+from route_cache import route_cache
+from services.provider_clients import http_get, http_post
+from request_deadline import stage_timeout
+from services.provider_health import provider_health, healthy_status
 
 # Load environment variables (explicit path to ensure it works)
 env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
@@ -33,8 +37,16 @@ def get_ors_route(start_coords: tuple, end_coords: tuple, mode: str = "driving")
         
     Returns:
         dict: Standardized response with 'routes' list looking like OSRM format
-              or None if failure.
+              or None if failure. Responses are cached (route_cache), so treat them as read-only.
     """
+    return route_cache.get_or_fetch(ors_route_cache_key(start_coords, end_coords, mode),
+                                    lambda: request_ors_route(start_coords, end_coords, mode))
+
+def ors_route_cache_key(start_coords: tuple, end_coords: tuple, mode: str = "driving"):
+    return route_cache.key("ors", mode, (start_coords, end_coords))
+
+def request_ors_route(start_coords: tuple, end_coords: tuple, mode: str):
+    """Uncached ORS directions request (see get_ors_route)"""
     if not ORS_API_KEY or ORS_API_KEY == "MY_API_KEY_HERE":
         print("ORS Service: Missing or invalid API Key")
         return None
@@ -61,10 +73,20 @@ def get_ors_route(start_coords: tuple, end_coords: tuple, mode: str = "driving")
         "Accept": "application/json, application/geo+json, application/gpx+xml, img/png; charset=utf-8"
     }
 
+    timeout = stage_timeout(10)
+    if timeout is None:
+        print("DEBUG: Skipping ORS route (request deadline reached)")
+        return None
+    if not provider_health.allow("ors", "route"):
+        print("DEBUG: Skipping ORS route (circuit open)")
+        return None
+
     try:
         # Using POST for greater control (and alternatives support)
         print(f"DEBUG: Requesting ORS Profile: {profile} for mode: {mode}")
-        response = requests.post(f"{ORS_BASE_URL}/{profile}/geojson", json=body, headers=headers, timeout=10)
+        with provider_health.track("ors", "route") as outcome:
+            response = http_post(f"{ORS_BASE_URL}/{profile}/geojson", json=body, headers=headers, timeout=timeout)
+            outcome.ok = healthy_status(response.status_code)
         
         if response.status_code == 200:
             data = response.json()
@@ -94,12 +116,12 @@ def _adapt_ors_to_osrm(ors_data):
         # DEBUG: Requested by User
         print(f"DEBUG: Raw ORS Response: {summary}")
 
-        # Extract geometry (already in [lon, lat] format)
-        geometry = feature.get('geometry', {})
+        # Extract geometry (GeoJSON [lon, lat]) straight into a [lat, lng] array
+        geometry = RouteGeometry.from_lnglat(feature.get('geometry', {}).get('coordinates', []))
         
         # Build OSRM-like route object
         route = {
-            'geometry': geometry, # {'type': 'LineString', 'coordinates': [[lon, lat], ...]}
+            'geometry': geometry, # RouteGeometry ([lat, lng] float64 array)
             'distance': summary.get('distance', 0),    # Meters (Strict)
             'duration': summary.get('duration', 0),    # Seconds (Strict)
             'weight_name': 'routability',
@@ -132,8 +154,15 @@ def search_places_ors(query: str):
         "size": 5
     }
     
+    timeout = stage_timeout(5)
     try:
-        resp = requests.get(url, params=params, timeout=5)
+        if timeout is None:
+            raise TimeoutError("request deadline reached")
+        if not provider_health.allow("ors", "search"):
+            raise ConnectionError("ORS search circuit open")
+        with provider_health.track("ors", "search") as outcome:
+            resp = http_get(url, params=params, timeout=timeout)
+            outcome.ok = healthy_status(resp.status_code)
         if resp.status_code == 200:
             data = resp.json()
             results = []
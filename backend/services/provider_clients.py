@@ -0,0 +1,113 @@
+import os
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from request_deadline import remaining_budget
+
+# Keep-alive pool sizing: one urllib3 pool per host, this many sockets kept per host
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "16"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+# googlemaps.Client only takes client-wide timeouts; keep them short (its retry default is 60 s)
+GMAPS_TIMEOUT_S = float(os.getenv("GMAPS_TIMEOUT_S", "5"))
+GMAPS_RETRY_TIMEOUT_S = float(os.getenv("GMAPS_RETRY_TIMEOUT_S", "8"))
+# Longest one googlemaps call can take: a retry may start just before retry_timeout and run a full timeout
+GMAPS_CALL_MAX_S = GMAPS_RETRY_TIMEOUT_S + GMAPS_TIMEOUT_S
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_gmaps_clients: Dict[str, object] = {}
+
+
+def get_session() -> requests.Session:
+    """
+    Shared keep-alive session for every routing/geocoding provider.
+    urllib3 keeps a separate connection pool per host, so ORS, OSRM, Google and
+    Nominatim each reuse their own warm TCP/TLS connections.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                # No transparent retries: fallbacks between providers are handled by the callers
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({'User-Agent': 'SafeRouteApp/1.0'})
+                _session = session
+    return _session
+
+
+def http_get(url, **kwargs) -> requests.Response:
+    return get_session().get(url, **kwargs)
+
+
+def http_post(url, **kwargs) -> requests.Response:
+    return get_session().post(url, **kwargs)
+
+
+def get_gmaps_client(key: str):
+    """Reusable googlemaps.Client per API key, sharing the pooled session"""
+    client = _gmaps_clients.get(key)
+    if client is None:
+        import googlemaps
+        session = get_session()
+        with _lock:
+            client = _gmaps_clients.get(key)
+            if client is None:
+                client = googlemaps.Client(key=key, requests_session=session, timeout=GMAPS_TIMEOUT_S,
+                                            retry_timeout=GMAPS_RETRY_TIMEOUT_S)
+                _gmaps_clients[key] = client
+    return client
+
+
+def gmaps_fits_budget() -> bool:
+    """
+    Whether a googlemaps call can run without overrunning the request deadline.
+    Its timeouts are fixed per client, so the call is skipped instead of clipped.
+    """
+    remaining = remaining_budget()
+    return remaining is None or remaining >= GMAPS_CALL_MAX_S
+
+
+def connection_stats() -> Dict:
+    """
+    Per-host request / new-connection counters read from the urllib3 pools.
+    reuse_rate is the share of requests served on an already-open connection.
+    """
+    hosts = {}
+    session = _session
+    if session is None:
+        return {"hosts": hosts, "requests": 0, "new_connections": 0, "reuse_rate": 0.0}
+
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}"
+            entry = hosts.setdefault(host, {"requests": 0, "new_connections": 0})
+            entry["requests"] += pool.num_requests
+            entry["new_connections"] += pool.num_connections
+
+    for entry in hosts.values():
+        entry["reuse_rate"] = _reuse_rate(entry["requests"], entry["new_connections"])
+    total_req = sum(e["requests"] for e in hosts.values())
+    total_new = sum(e["new_connections"] for e in hosts.values())
+    return {"hosts": hosts, "requests": total_req, "new_connections": total_new,
+            "reuse_rate": _reuse_rate(total_req, total_new)}
+
+
+def _reuse_rate(requests_made, new_connections):
+    if not requests_made:
+        return 0.0
+    return round(max(0, requests_made - new_connections) / requests_made, 4)
+
@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# EWMA smoothing for error rate and latency (weight of the newest sample)
+HEALTH_EWMA_ALPHA = float(os.getenv("PROVIDER_HEALTH_ALPHA", "0.2"))
+# Circuit opens after this many consecutive failures and stays open for the cooldown,
+# after which a single probe call is let through (half-open)
+BREAKER_FAILURES = int(os.getenv("PROVIDER_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_S = float(os.getenv("PROVIDER_BREAKER_COOLDOWN_S", "30"))
+# A provider above either threshold is moved behind the healthy ones in a fallback chain
+DEGRADED_ERROR_RATE = float(os.getenv("PROVIDER_DEGRADED_ERROR_RATE", "0.5"))
+DEGRADED_LATENCY_S = float(os.getenv("PROVIDER_DEGRADED_LATENCY_S", "3.0"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def healthy_status(status_code: int) -> bool:
+    """Rate limiting and server errors count against a provider; other 4xx are our own fault"""
+    return status_code < 500 and status_code != 429
+
+
+class ProviderHealth:
+    """Health of one (provider, endpoint) pair: EWMAs, counters and circuit state"""
+
+    def __init__(self):
+        self.error_rate = 0.0
+        self.latency_s = None
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+
+    def degraded(self) -> bool:
+        return self.error_rate > DEGRADED_ERROR_RATE or (self.latency_s or 0.0) > DEGRADED_LATENCY_S
+
+    def snapshot(self) -> Dict:
+        return {
+            "state": self.state,
+            "error_rate": round(self.error_rate, 4),
+            "latency_ms": None if self.latency_s is None else round(self.latency_s * 1000, 1),
+            "calls": self.calls,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "degraded": self.degraded(),
+        }
+
+
+class CallOutcome:
+    """Handed out by ProviderRegistry.track; set ok = False for a bad response (e.g. 429/5xx)"""
+    __slots__ = ('ok',)
+
+    def __init__(self):
+        self.ok = True
+
+
+class ProviderRegistry:
+    """
+    Process-wide health registry for the external providers.
+    Fetchers report every call through track(); fallback chains ask rank() for
+    the order to try providers in and skip those whose circuit is open.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._health: Dict[Tuple[str, str], ProviderHealth] = {}
+
+    def _get(self, provider: str, endpoint: str) -> ProviderHealth:
+        key = (provider, endpoint)
+        health = self._health.get(key)
+        if health is None:
+            health = self._health.setdefault(key, ProviderHealth())
+        return health
+
+    def allow(self, provider: str, endpoint: str) -> bool:
+        """False while the circuit is open; lets one probe through once the cooldown has passed"""
+        with self._lock:
+            health = self._get(provider, endpoint)
+            if health.state == CLOSED:
+                return True
+            if health.state == OPEN and time.monotonic() - health.opened_at >= BREAKER_COOLDOWN_S:
+                health.state = HALF_OPEN
+                return True
+            return False
+
+    def record(self, provider: str, endpoint: str, ok: bool, latency_s: float):
+        with self._lock:
+            health = self._get(provider, endpoint)
+            health.calls += 1
+            health.error_rate += HEALTH_EWMA_ALPHA * ((0.0 if ok else 1.0) - health.error_rate)
+            if health.latency_s is None:
+                health.latency_s = latency_s
+            else:
+                health.latency_s += HEALTH_EWMA_ALPHA * (latency_s - health.latency_s)
+
+            if ok:
+                health.consecutive_failures = 0
+                health.state = CLOSED
+                return
+            health.failures += 1
+            health.consecutive_failures += 1
+            if health.state == HALF_OPEN or health.consecutive_failures >= BREAKER_FAILURES:
+                if health.state != OPEN:
+                    print(f"⚠️ Circuit OPEN for {provider}/{endpoint} "
+                          f"({health.consecutive_failures} consecutive failures)")
+                health.state = OPEN
+                health.opened_at = time.monotonic()
+
+    @contextmanager
+    def track(self, provider: str, endpoint: str):
+        """Times the block and records it; an exception counts as a failure and is re-raised"""
+        outcome = CallOutcome()
+        t0 = time.perf_counter()
+        try:
+            yield outcome
+        except BaseException:
+            outcome.ok = False
+            raise
+        finally:
+            self.record(provider, endpoint, outcome.ok, time.perf_counter() - t0)
+
+    def rank(self, endpoint: str, providers: Sequence[str]) -> List[str]:
+        """
+        Order to try providers in: healthy ones keep their configured (preference)
+        order, degraded ones follow sorted by error rate then latency, and
+        providers with an open circuit are left out.
+        """
+        with self._lock:
+            healthy, degraded = [], []
+            for name in providers:
+                health = self._get(name, endpoint)
+                if health.state == OPEN and time.monotonic() - health.opened_at < BREAKER_COOLDOWN_S:
+                    continue
+                (degraded if health.degraded() else healthy).append((name, health))
+        degraded.sort(key=lambda item: (item[1].error_rate, item[1].latency_s or 0.0))
+        return [name for name, _ in healthy + degraded]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            out: Dict[str, Dict] = {}
+            for (provider, endpoint), health in sorted(self._health.items()):
+                out.setdefault(provider, {})[endpoint] = health.snapshot()
+        return out
+
+
+provider_health = ProviderRegistry()
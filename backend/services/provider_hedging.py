@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from request_deadline import remaining_budget, submit_in_context
+
+# "off": primary, then secondary only after it failed (the old sequential fallback)
+# "hedge": fire the secondary once the primary is slower than its usual latency
+# "race": fire both at once (fastest, but every request spends quota on both)
+DIRECT_ROUTE_HEDGE_MODE = os.getenv("DIRECT_ROUTE_HEDGE_MODE", "hedge").lower()
+# Fixed hedge delay in seconds; when unset the delay follows the primary's observed latency percentile
+DIRECT_ROUTE_HEDGE_DELAY_S = os.getenv("DIRECT_ROUTE_HEDGE_DELAY_S")
+DIRECT_ROUTE_HEDGE_PERCENTILE = float(os.getenv("DIRECT_ROUTE_HEDGE_PERCENTILE", "95"))
+# Delay used until enough primary latencies have been observed
+HEDGE_DEFAULT_DELAY_S = 2.0
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 200
+
+# Own pool: hedged calls are issued from route-fetch workers, and nesting them
+# in the same pool could starve it
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("HEDGE_WORKERS", "16")), thread_name_prefix="hedge")
+
+
+class LatencyWindow:
+    """Rolling window of the last completed call latencies (seconds)"""
+
+    def __init__(self, size: int = HEDGE_WINDOW):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        k = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[k]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class HedgedCall:
+    """
+    Primary/secondary provider pair where the first valid answer wins.
+
+    Callers pass the pair already ordered (see provider_health.rank), so the
+    primary can change at runtime; latency windows are kept per provider.
+    The losing call is cancelled if it has not started yet; a request already
+    on the wire cannot be aborted, so its result is simply dropped.
+    """
+
+    def __init__(self, mode: str = "hedge", delay_s: Optional[float] = None, percentile: float = 95.0):
+        self.mode = mode
+        self.fixed_delay_s = delay_s
+        self.percentile = percentile
+        self._lock = threading.Lock()
+        self._latency: Dict[str, LatencyWindow] = {}
+        self._counters = {"calls": 0, "hedged": 0, "fallbacks": 0, "failures": 0}
+        self._wins: Dict[str, int] = {}
+
+    def _window(self, name: str) -> LatencyWindow:
+        with self._lock:
+            return self._latency.setdefault(name, LatencyWindow())
+
+    def hedge_delay(self, primary_name: str) -> float:
+        if self.fixed_delay_s is not None:
+            return self.fixed_delay_s
+        observed = self._window(primary_name).percentile(self.percentile)
+        return HEDGE_DEFAULT_DELAY_S if observed is None else observed
+
+    def _count(self, key: str):
+        with self._lock:
+            self._counters[key] += 1
+
+    def _timed(self, name: str, fn: Callable, is_valid: Callable):
+        """Runs fn, recording its latency only for valid results: instant early-return None
+        (open circuit, spent deadline) must not drag the hedge percentile down"""
+        t0 = time.perf_counter()
+        result = fn()
+        if is_valid(result):
+            self._window(name).record(time.perf_counter() - t0)
+        return result
+
+    def call(self, providers: Sequence[Tuple[str, Callable]], is_valid: Callable = bool):
+        """providers: [(name, fn), ...] in preference order; only the first two take part"""
+        self._count("calls")
+        providers = list(providers)[:2]
+        if not providers:
+            self._finish(None, None, is_valid)
+            return None
+        primary_name, primary = providers[0]
+        if len(providers) == 1 or self.mode == "off":
+            result = self._timed(primary_name, primary, is_valid)
+            if is_valid(result) or len(providers) == 1:
+                self._finish(result, primary_name, is_valid)
+                return result
+            self._count("fallbacks")
+            secondary_name, secondary = providers[1]
+            result = self._timed(secondary_name, secondary, is_valid)
+            self._finish(result, secondary_name, is_valid)
+            return result
+        secondary_name, secondary = providers[1]
+
+        names = {}
+        pending = set()
+
+        def launch(fn, name):
+            fut = submit_in_context(_HEDGE_POOL, fn)
+            names[fut] = name
+            pending.add(fut)
+            return fut
+
+        first = launch(lambda: self._timed(primary_name, primary, is_valid), primary_name)
+        fire_secondary = lambda: launch(lambda: self._timed(secondary_name, secondary, is_valid), secondary_name)
+        secondary_fired = False
+        if self.mode == "race":
+            fire_secondary()
+            secondary_fired = True
+        else:
+            delay = self.hedge_delay(primary_name)
+            budget = remaining_budget()
+            if budget is not None:
+                delay = min(delay, budget)
+            wait([first], timeout=delay)
+            if not first.done():
+                # Primary is slower than usual: hedge with the secondary
+                self._count("hedged")
+                fire_secondary()
+                secondary_fired = True
+
+        result = None
+        winner = None
+        while pending:
+            done, pending = wait(pending, timeout=remaining_budget(), return_when=FIRST_COMPLETED)
+            if not done:
+                print(f"DEBUG: Hedged {primary_name}/{secondary_name} call hit the request deadline")
+                break
+            for fut in done:
+                try:
+                    value = fut.result()
+                except Exception as e:
+                    print(f"DEBUG: {names[fut]} call failed: {e}")
+                    value = None
+                if winner is None and is_valid(value):
+                    result, winner = value, names[fut]
+            if winner is not None:
+                break
+            if not secondary_fired:
+                # Primary failed before the hedge fired: plain fallback
+                self._count("fallbacks")
+                fire_secondary()
+                secondary_fired = True
+
+        for fut in pending:
+            fut.cancel()
+        self._finish(result, winner, is_valid)
+        return result
+
+    def _finish(self, result, winner: Optional[str], is_valid: Callable):
+        if winner is not None and is_valid(result):
+            with self._lock:
+                self._wins[winner] = self._wins.get(winner, 0) + 1
+        else:
+            self._count("failures")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            counters["wins"] = dict(self._wins)
+            names = list(self._latency)
+        counters["mode"] = self.mode
+        counters["hedge_delay_s"] = {name: round(self.hedge_delay(name), 3) for name in names}
+        return counters
+
+
+def _parse_delay(value: Optional[str]) -> Optional[float]:
+    return float(value) if value not in (None, "") else None
+
+
+# Direct route: ORS / OSRM pair, ordered per request by provider health
+direct_route_hedge = HedgedCall(mode=DIRECT_ROUTE_HEDGE_MODE,
+                                delay_s=_parse_delay(DIRECT_ROUTE_HEDGE_DELAY_S),
+                                percentile=DIRECT_ROUTE_HEDGE_PERCENTILE)
@@ -0,0 +1,126 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import numpy as np
+
+from geo_kernels import EARTH_RADIUS_KM, haversine_km_rad
+
+# Quantization of the memo (degrees, ~110 m) and max number of cells kept (LRU)
+ZONE_MEMO_CELL_DEG = float(os.getenv("ZONE_MEMO_CELL_DEG", "0.001"))
+ZONE_MEMO_MAX_CELLS = int(os.getenv("ZONE_MEMO_MAX_CELLS", "200000"))
+
+KM_PER_DEG = math.radians(EARTH_RADIUS_KM)
+
+
+def route_cells(route: np.ndarray, cell_deg: float) -> np.ndarray:
+    """Unique (i, j) grid cells touched by the polyline, sampled so no step skips more than one cell"""
+    if len(route) < 2:
+        samples = route
+    else:
+        a, b = route[:-1], route[1:]
+        span = np.abs(b - a).max(axis=1)
+        steps = np.maximum(np.ceil(span / cell_deg), 1).astype(np.int64)
+        seg = np.repeat(np.arange(len(a)), steps)
+        # Position of each sample within its segment: 0, 1/k, ..., (k-1)/k
+        offsets = np.arange(len(seg)) - np.repeat(np.cumsum(steps) - steps, steps)
+        frac = (offsets / steps[seg])[:, None]
+        samples = np.vstack((a[seg] + frac * (b[seg] - a[seg]), route[-1:]))
+    return np.unique(np.floor(samples / cell_deg).astype(np.int64), axis=0)
+
+
+class ZoneCellMemo:
+    """
+    LRU memo of quantized coordinate cell -> zones that may cover that cell.
+
+    Keys are (zone data version, padding, cell), so entries are shared between the
+    candidates of one request (direct / bow / fallback routes overlap near both ends)
+    and across requests on popular corridors, and go stale automatically when the
+    zone data changes. Values are conservative: any route point inside the cell can
+    only be within radius + padding of the listed zones.
+    """
+
+    def __init__(self, cell_deg: float = ZONE_MEMO_CELL_DEG, max_cells: int = ZONE_MEMO_MAX_CELLS):
+        self.cell_deg = cell_deg
+        self.max_cells = max_cells
+        # Any point sampled into a cell is within one cell (Chebyshev, in degrees) of its centre
+        self.slack_km = math.sqrt(2) * cell_deg * KM_PER_DEG
+        self._cells: "OrderedDict[Tuple, Tuple[int, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _route_cells(self, route: np.ndarray) -> np.ndarray:
+        return route_cells(route, self.cell_deg)
+
+    def candidates(self, zone_set, route: np.ndarray, pad_km: float = 0.0) -> np.ndarray:
+        """Zone indices (into zone_set) that any point of the route may lie within radius + pad_km of"""
+        if len(route) == 0 or len(zone_set) == 0:
+            return np.zeros(0, dtype=np.intp)
+
+        pad_key = round(pad_km, 6)
+        # Sampling and np.unique run before taking the lock, which only guards the LRU itself
+        cells = list(map(tuple, self._route_cells(route).tolist()))
+        found = set()
+        missed = []
+        with self._lock:
+            for cell in cells:
+                key = (zone_set.version, pad_key) + cell
+                zones = self._cells.get(key)
+                if zones is None:
+                    missed.append(cell)
+                    self.misses += 1
+                else:
+                    self._cells.move_to_end(key)
+                    found.update(zones)
+                    self.hits += 1
+
+        if missed:
+            computed = self._resolve(zone_set, np.array(missed, dtype=np.int64), pad_key)
+            with self._lock:
+                for cell, zones in computed.items():
+                    self._cells[(zone_set.version, pad_key) + cell] = zones
+                    found.update(zones)
+                while len(self._cells) > self.max_cells:
+                    self._cells.popitem(last=False)
+
+        return np.array(sorted(found), dtype=np.intp)
+
+    def _resolve(self, zone_set, cells: np.ndarray, pad_km: float) -> Dict[Tuple[int, int], Tuple[int, ...]]:
+        """Computes zone lists for uncached cells in one batched distance pass"""
+        centres = (cells + 0.5) * self.cell_deg
+        reach_km = pad_km + self.slack_km
+        ids = np.asarray(zone_set.index.candidate_zones_for_points(centres, reach_km), dtype=np.intp)
+        if len(ids) == 0:
+            return {cell: () for cell in map(tuple, cells.tolist())}
+
+        centres_rad = np.radians(centres)
+        dist = haversine_km_rad(centres_rad[:, 0:1], centres_rad[:, 1:2], np.cos(centres_rad[:, 0:1]),
+                                zone_set.lat_rad[ids], zone_set.lng_rad[ids], zone_set.cos_lat[ids])
+        # 1% + 1 m margin keeps the bound conservative against the planar kernels downstream
+        near = dist <= (zone_set.radius_km[ids] + reach_km) * 1.01 + 0.001
+        return {cell: tuple(ids[row].tolist()) for cell, row in zip(map(tuple, cells.tolist()), near)}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cells": len(self._cells),
+                "max_cells": self.max_cells,
+                "cell_deg": self.cell_deg,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Shared instance (per process)
+zone_cell_memo = ZoneCellMemo()
@@ -0,0 +1,91 @@
+import math
+import numpy as np
+from typing import Dict, Iterator, List, Tuple
+
+# Approx. km per degree of latitude (matches the rough conversion used in risk_engine)
+KM_PER_DEG_LAT = 111.0
+
+# Default cell size in degrees (~2.2 km). Zones are usually 300 m - 2 km wide,
+# so a zone normally lands in 1-4 cells and a route vertex only sees its neighbours.
+DEFAULT_CELL_DEG = 0.02
+
+
+class ZoneGridIndex:
+    """
+    Uniform lat/lng grid over zone bounding boxes.
+    Every zone is registered in each cell its bounding box touches, so a point
+    only needs to be tested against the zones stored in its own cell.
+    """
+
+    def __init__(self, lat: np.ndarray, lng: np.ndarray, radius_km: np.ndarray,
+                 cell_deg: float = DEFAULT_CELL_DEG, pad_km: float = 0.0):
+        self.cell_deg = cell_deg
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+        for idx, (z_lat, z_lng, z_radius) in enumerate(zip(lat.tolist(), lng.tolist(), radius_km.tolist())):
+            self.insert(idx, z_lat, z_lng, z_radius + pad_km)
+
+    def cell_of(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def insert(self, idx: int, lat: float, lng: float, radius_km: float):
+        # Bounding box of the circle in degrees (longitude shrinks with latitude)
+        d_lat = radius_km / KM_PER_DEG_LAT
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        d_lng = radius_km / (KM_PER_DEG_LAT * cos_lat)
+
+        lat_lo, lng_lo = self.cell_of(lat - d_lat, lng - d_lng)
+        lat_hi, lng_hi = self.cell_of(lat + d_lat, lng + d_lng)
+        for i in range(lat_lo, lat_hi + 1):
+            for j in range(lng_lo, lng_hi + 1):
+                self.cells.setdefault((i, j), []).append(idx)
+
+    def candidates(self, lat: float, lng: float) -> List[int]:
+        """Zone indices whose bounding box overlaps the cell containing (lat, lng)"""
+        return self.cells.get(self.cell_of(lat, lng), [])
+
+    def candidate_zones_for_points(self, points: np.ndarray, pad_km: float = 0.0) -> List[int]:
+        """Sorted zone indices whose cells overlap a box of +/- pad_km around any (lat, lng) point"""
+        if len(points) == 0 or not self.cells:
+            return []
+
+        pad_lat = pad_km / KM_PER_DEG_LAT
+        cos_lat = max(float(np.cos(np.radians(np.abs(points[:, 0]).max()))), 1e-6)
+        pad_lng = pad_km / (KM_PER_DEG_LAT * cos_lat)
+
+        lo = np.floor((points - (pad_lat, pad_lng)) / self.cell_deg).astype(np.int64)
+        hi = np.floor((points + (pad_lat, pad_lng)) / self.cell_deg).astype(np.int64)
+        boxes = np.unique(np.hstack((lo, hi)), axis=0)
+
+        found = set()
+        seen = set()
+        for i_lo, j_lo, i_hi, j_hi in boxes.tolist():
+            for i in range(i_lo, i_hi + 1):
+                for j in range(j_lo, j_hi + 1):
+                    if (i, j) in seen:
+                        continue
+                    seen.add((i, j))
+                    found.update(self.cells.get((i, j), ()))
+        return sorted(found)
+
+    def segment_groups(self, starts: np.ndarray, ends: np.ndarray) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Groups segments (e.g. graph edges) by the grid cell of their midpoint and yields
+        (segment rows, candidate zone indices) for every group near at least one zone.
+        A segment lies within half its length of its midpoint, so the candidates of a group
+        are the zones in the cells around its midpoints padded by the group's longest half-segment.
+        """
+        if len(starts) == 0 or not self.cells:
+            return
+        mid = (starts + ends) / 2
+        cos_lat = np.maximum(np.cos(np.radians(mid[:, 0])), 1e-6)
+        half_km = np.hypot(ends[:, 0] - starts[:, 0], (ends[:, 1] - starts[:, 1]) * cos_lat) * KM_PER_DEG_LAT / 2
+
+        cells = np.floor(mid / self.cell_deg).astype(np.int64)
+        _, group = np.unique(cells, axis=0, return_inverse=True)
+        group = group.reshape(-1)
+        order = np.argsort(group, kind="stable")
+        for rows in np.split(order, np.flatnonzero(np.diff(group[order])) + 1):
+            ids = self.candidate_zones_for_points(mid[rows], float(half_km[rows].max()) * 1.01 + 0.01)
+            if ids:
+                yield rows, np.asarray(ids, dtype=np.intp)
@@ -0,0 +1,112 @@
+import hashlib
+import json
+from enum import IntEnum
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from zone_index import ZoneGridIndex
+
+
+class Severity(IntEnum):
+    """Zone severity as scored by the risk engine (anything not HIGH scores as MEDIUM)"""
+    MEDIUM = 1
+    HIGH = 2
+
+
+def zone_radius_km(zone: Dict) -> float:
+    """Normalize a zone's radius to KM (radius_meters > radius_km > 1 km default)"""
+    if 'radius_meters' in zone:
+        return float(zone['radius_meters']) / 1000.0
+    if 'radius_km' in zone:
+        return float(zone['radius_km'])
+    return 1.0
+
+
+def zone_data_version(zones: Sequence[Dict]) -> str:
+    """Content hash of a zone list; changes whenever any zone is added, removed or edited"""
+    payload = json.dumps(list(zones), sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def _frozen(values, dtype) -> np.ndarray:
+    arr = np.ascontiguousarray(values, dtype=dtype)
+    arr.flags.writeable = False
+    return arr
+
+
+class ZoneSet:
+    """
+    Compiled, immutable view of the zone data used by the scoring engine.
+
+    Everything the hot path needs is precomputed once per data version:
+    coordinates in degrees and radians, cos(lat), radius in KM and severity,
+    stored as read-only arrays. Names and reasons are only read for zones
+    that were actually hit.
+    """
+
+    __slots__ = ('version', 'lat', 'lng', 'lat_rad', 'lng_rad', 'cos_lat',
+                 'radius_km', 'severity', 'names', 'reasons', 'index')
+
+    def __init__(self, zones: Sequence[Dict], version: Optional[str] = None):
+        # Guard against malformed zone data: zones without coordinates can never be hit
+        valid = [z for z in zones if 'lat' in z and 'lng' in z]
+
+        lat = _frozen([float(z['lat']) for z in valid], np.float64)
+        lng = _frozen([float(z['lng']) for z in valid], np.float64)
+        radius_km = _frozen([zone_radius_km(z) for z in valid], np.float64)
+        lat_rad = _frozen(np.radians(lat), np.float64)
+
+        setattr_ = object.__setattr__
+        setattr_(self, 'version', version or zone_data_version(zones))
+        setattr_(self, 'lat', lat)
+        setattr_(self, 'lng', lng)
+        setattr_(self, 'lat_rad', lat_rad)
+        setattr_(self, 'lng_rad', _frozen(np.radians(lng), np.float64))
+        setattr_(self, 'cos_lat', _frozen(np.cos(lat_rad), np.float64))
+        setattr_(self, 'radius_km', radius_km)
+        setattr_(self, 'severity', _frozen(
+            [Severity.HIGH if z.get('risk_level', 'MEDIUM') == "HIGH" else Severity.MEDIUM for z in valid], np.int8))
+        setattr_(self, 'names', tuple(z.get('name') for z in valid))
+        setattr_(self, 'reasons', tuple(z.get('reason') for z in valid))
+        setattr_(self, 'index', ZoneGridIndex(lat, lng, radius_km))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ZoneSet is immutable")
+
+    # Pickle support (process-pool workers receive the compiled set once at start-up)
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+            object.__setattr__(self, name, value)
+
+    def __len__(self):
+        return len(self.lat)
+
+    def __repr__(self):
+        return f"ZoneSet(version={self.version!r}, zones={len(self)})"
+
+
+# Last compiled set; zone data rarely changes, so one slot is enough
+_compiled: Optional[ZoneSet] = None
+
+
+def compile_zone_set(zones: Sequence[Dict], version: Optional[str] = None) -> ZoneSet:
+    """
+    Returns the ZoneSet for this zone data, compiling only when the data version changed.
+    Callers that already know the version (the data layer derives it on load) pass it in;
+    otherwise it is hashed from the content, which is linear in the number of zones.
+    """
+    global _compiled
+    version = version or zone_data_version(zones)
+    cached = _compiled
+    if cached is not None and cached.version == version:
+        return cached
+    print(f"DEBUG: Compiling ZoneSet {version} ({len(zones)} zones)")
+    cached = ZoneSet(zones, version)
+    _compiled = cached
+    return cached